@@ -8,9 +8,20 @@ Init
 
 __all__ = [
 	'__main__',
+	'audio',
+	'benchmark',
+	'log',
+	'pong_ai',
+	'pong_bot',
+	'pong_capture',
 	'pong_client',
 	'pong_common',
+	'pong_env',
+	'pong_peer',
+	'pong_proxy',
+	'pong_record',
 	'pong_server',
+	'profiler',
 	'renderer',
 	'renderer_basic',
 	'renderer_opengl',
@@ -4,40 +4,85 @@
 
 """
 Main
+- only the launched mode is imported: the server, proxy, bots and headless replay run without pygame
 """
 
 from argparse import ArgumentParser
+from typing import Callable, Set
 
-from pong_client import MainClient
-from pong_common import VERSION
-from pong_server import MainServer
+from log import logger
+
+
+def MainMode(argsSet: Set[str]) -> Callable:
+	"""Import the entry point of a mode
+	:param argsSet: options with a value
+	"""
+	if argsSet & {'version'}:
+		from pong_common import VERSION
+		return lambda **kwargs: print(VERSION)
+	elif argsSet & {'server'}:
+		from pong_server import MainServer
+		return MainServer
+	elif argsSet & {'proxy'}:
+		from pong_proxy import MainProxy
+		return MainProxy
+	elif argsSet & {'loadtest'}:
+		from pong_bot import MainLoadTest
+		return MainLoadTest
+	elif argsSet >= {'headless', 'replay'}:
+		from pong_record import MainReplay
+		return MainReplay
+	else:
+		from pong_client import MainClient
+		return MainClient
 
 
 def main():
 	parser = ArgumentParser(description='Battle Pong', prog='python __main__.py')
 	add    = parser.add_argument
 
-	add('--fps'        , nargs='?', default=0          , const=120    , type=int  , help='FPS limit')
-	add('--host'       , nargs='?', default='127.0.0.1',                type=str  , help='Server address')
-	add('--interpolate', nargs='?', default=1          , const=1      , type=int  , help='Interpolate physics')
-	add('--port'       , nargs='?', default=9000       ,                type=int  , help='Server port')
-	add('--protocol'   , nargs='?', default='tcp'      , const='tcp'  , type=str  , help='Network protocol', choices=['tcp', 'udp'])
-	add('--reconnect'  , nargs='?', default=3          ,                type=float, help='Reconnect every x sec')
-	add('--renderer'   , nargs='?', default='basic'    , const='basic', type=str  , help='Renderer to use', choices=['basic', 'opengl'])
-	add('--server'     , nargs='?', default=0          , const=1      , type=int  , help='Run a server')
-	add('--size'       , nargs='?', default=1280       ,                type=int  , help='Resolution')
-	add('--version'    , nargs='?', default=0          , const=1      , type=int  , help='Show the version')
+	add('--ball-pool'    , nargs='?', default=16         ,                type=int  , help='Max number of balls')
+	add('--bots'         , nargs='?', default=1          , const=1      , type=int  , help='Server bots play in empty slots')
+	add('--bandwidth'    , nargs='?', default=''         ,                type=str  , help='Proxy: kbit/s cap, up[,down]')
+	add('--capture'      , nargs='?', default=''         ,                type=str  , help='Save the received datagrams to this file')
+	add('--chaos'        , nargs='?', default=0          , const=256    , type=int  , help='Chaos mode: number of balls')
+	add('--difficulty'   , nargs='?', default=0.7        ,                type=float, help='Server bots difficulty: 0 to 1')
+	add('--dirty'        , nargs='?', default=0          , const=1      , type=int  , help='Basic renderer: present only the changed rects')
+	add('--duplicate'    , nargs='?', default=''         ,                type=str  , help='Proxy: duplicated %%, up[,down]')
+	add('--duration'     , nargs='?', default=5          ,                type=float, help='Load test: seconds per step')
+	add('--fps'          , nargs='?', default=0          , const=120    , type=int  , help='FPS limit')
+	add('--headless'     , nargs='?', default=0          , const=1      , type=int  , help='Replay without a window')
+	add('--host'         , nargs='?', default='127.0.0.1',                type=str  , help='Server address')
+	add('--interpolate'  , nargs='?', default=1          , const=1      , type=int  , help='Interpolate physics')
+	add('--jitter'       , nargs='?', default=''         ,                type=str  , help='Proxy: jitter in ms, up[,down]')
+	add('--latency'      , nargs='?', default=''         ,                type=str  , help='Proxy: latency in ms, up[,down]')
+	add('--loadtest'     , nargs='?', default=0          , const=16     , type=int  , help='Load test: max number of bots')
+	add('--log-file'     , nargs='?', default=''         ,                type=str  , help='Write the log to this file instead of stdout')
+	add('--log-format'   , nargs='?', default='text'     , const='json' , type=str  , help='Log format', choices=['json', 'text'])
+	add('--log-level'    , nargs='?', default='info'     , const='debug', type=str  , help='Min log level', choices=['debug', 'info', 'warning', 'error'])
+	add('--loss'         , nargs='?', default=''         ,                type=str  , help='Proxy: lost %%, up[,down]')
+	add('--port'         , nargs='?', default=9000       ,                type=int  , help='Server port')
+	add('--profile'      , nargs='?', default=''         ,                type=str  , help='Export the stage timings to a JSON file on exit')
+	add('--protocol'     , nargs='?', default='tcp'      , const='tcp'  , type=str  , help='Network protocol', choices=['tcp', 'udp'])
+	add('--proxy'        , nargs='?', default=0          , const=9001   , type=int  , help='Run an impairment proxy on this port, forwards to --host:--port')
+	add('--proxy-log'    , nargs='?', default=''         ,                type=str  , help='Proxy: log every datagram to this CSV file')
+	add('--record'       , nargs='?', default=''         ,                type=str  , help='Server: record the match to this file')
+	add('--reconnect'    , nargs='?', default=3          ,                type=float, help='Reconnect every x sec')
+	add('--reorder'      , nargs='?', default=''         ,                type=str  , help='Proxy: reordered %%, up[,down]')
+	add('--render-thread', nargs='?', default=0          , const=1      , type=int  , help='Draw in a separate thread, basic renderer')
+	add('--renderer'     , nargs='?', default='basic'    , const='basic', type=str  , help='Renderer to use', choices=['basic', 'opengl'])
+	add('--replay'       , nargs='?', default=''         ,                type=str  , help='Replay a recorded match')
+	add('--server'       , nargs='?', default=0          , const=1      , type=int  , help='Run a server')
+	add('--size'         , nargs='?', default=1280       ,                type=int  , help='Resolution')
+	add('--speed'        , nargs='?', default=1.0        ,                type=float, help='Replay speed, 0 = as fast as possible when headless')
+	add('--version'      , nargs='?', default=0          , const=1      , type=int  , help='Show the version')
 
 	args    = parser.parse_args()
 	kwargs  = vars(args)
 	argsSet = set(item for item, value in kwargs.items() if value)
+	logger.Setup(**kwargs)
 
-	if argsSet & {'version'}:
-		print(VERSION)
-	elif argsSet & {'server'}:
-		MainServer(**kwargs)
-	else:
-		MainClient(**kwargs)
+	MainMode(argsSet)(**kwargs)
 
 
 if __name__ == '__main__':
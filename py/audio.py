@@ -0,0 +1,85 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Audio
+- all sounds are decoded once, at startup, in a background thread
+- fixed pool of mixer channels: when all are busy, new sounds are dropped
+- each sound plays at most once per frame, and not again before AUDIO_GAP
+- events sharing a source share its sound
+"""
+
+import os
+import threading
+from time import perf_counter
+from typing import List
+
+import pygame
+
+from log import logger
+
+AUDIO_CHANNELS = 8                          # mixer channel pool
+AUDIO_EXTS     = ('.ogg', '.mp3', '.wav')   # in order of preference
+AUDIO_GAP      = 0.04                       # min time between 2 plays of the same sound, in sec
+
+
+class AudioManager:
+	def __init__(self, path: str, sources: List[str], channels: int = AUDIO_CHANNELS):
+		"""
+		:param path: sound folder
+		:param sources: base names, '' for no sound
+		"""
+		self.channels = channels
+		self.ids      = [sources.index(source) for source in sources]  # event => 1st event with the same source
+		self.lastPlay = [0.0] * len(sources)    # perf_counter of the last play, per sound
+		self.path     = path
+		self.sounds   = [None] * len(sources)   # type: List[pygame.mixer.Sound]
+		self.sources  = sources
+		self.thread   = None                    # type: threading.Thread
+		self.volume   = 1.0
+
+	def Load(self):
+		"""Decode all the sounds, a missing or bad file only disables its own sound
+		"""
+		for sid, source in enumerate(self.sources):
+			if not source or self.ids[sid] != sid: continue
+
+			baseName = os.path.join(self.path, source)
+			for ext in AUDIO_EXTS:
+				filename = baseName + ext
+				if not os.path.exists(filename): continue
+				try:
+					sound = pygame.mixer.Sound(filename)
+					sound.set_volume(self.volume)
+					self.sounds[sid] = sound
+					break
+				except pygame.error:
+					logger.Warning('Audio.load', filename=filename)
+
+	def Play(self, sids: List[int]):
+		"""Play sounds triggered during a frame, duplicates are merged
+		:param sids: event ids, indices in sources
+		"""
+		now = perf_counter()
+		for sid in {self.ids[sid] for sid in sids}:
+			# not loaded yet, or missing
+			if not (sound := self.sounds[sid]): continue
+			if now < self.lastPlay[sid] + AUDIO_GAP: continue
+
+			# all channels busy => drop
+			if not (channel := pygame.mixer.find_channel()): break
+			channel.play(sound)
+			self.lastPlay[sid] = now
+
+	def SetVolume(self, volume: float):
+		self.volume = volume
+		for sound in self.sounds:
+			if sound: sound.set_volume(volume)
+
+	def Start(self):
+		"""Reserve the channel pool then decode in the background, the game starts right away
+		"""
+		pygame.mixer.set_num_channels(self.channels)
+		self.thread = threading.Thread(target=self.Load, name='audio', daemon=True)
+		self.thread.start()
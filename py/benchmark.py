@@ -0,0 +1,684 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Benchmark
+- python benchmark.py --chaos 1,16,64,256,512
+- python benchmark.py --capture server.cap --target server
+- python benchmark.py --all --output new.json --baseline old.json
+- python benchmark.py --startup server,proxy,client
+- python benchmark.py --render 256,512 --renderer basic,opengl --size 2560
+- seeded scenarios, metrics ending with Ms/Us/Mb: lower is better, with PerSec: higher is better
+"""
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import gc
+import io
+import json
+import os
+from random import seed
+import re
+import subprocess
+import sys
+from time import perf_counter
+from typing import List, Tuple
+import tracemalloc
+
+import numpy as np
+
+from common import Percentile
+from log import LOG_WARNING, logger
+from pong_ai import PongAI
+from pong_capture import ReadCapture
+from pong_common import Body, Pong, UdpHeader
+from pong_env import PongEnv
+from pong_peer import PongPeer
+from pong_server import PongServer
+from profiler import Profiler
+
+BENCH_ALL = {                               # --all: argument => default values
+	'ai': '1,16,64',
+	'chaos': '1,16,64,256',
+	'codec': 1,
+	'contact': '64,256',
+	'interpolate': '1,64,256',
+	'physics': '1,16,64,256',
+	'render': '1,64,256',
+	'share': '1,4,16,64',
+	'startup': 'version,server,proxy,loadtest,replay,client',
+}
+BENCH_PARAMS = {                            # fields that identify a scenario, the other fields are results
+	'balls', 'bench', 'clients', 'dirty', 'envs', 'frames', 'mode', 'object', 'opponents', 'packets', 'predict',
+	'reaction', 'renderer', 'size', 'steps', 'target',
+}
+METRIC_HIGHER    = re.compile(r'PerSec$')   # higher is better
+METRIC_LOWER     = re.compile(r'(Ms|Us|Mb)\d*$')  # lower is better
+RENDER_CLEAR     = (40, 40, 40)             # layer background, the other pixels count as drawn
+RENDER_DIFF      = 0.05                     # max fraction of the drawn pixels off, ball lines + edges are antialiased differently
+RENDER_TOLERANCE = 64                       # max channel difference of a matching pixel
+
+
+class SinkUdp:
+	"""Replaces pyuv.UDP: counts what would have been sent
+	"""
+	def __init__(self):
+		self.bytes   = 0
+		self.packets = 0
+
+	def send(self, address: Tuple[str, int], data: bytes):
+		self.bytes   += len(data)
+		self.packets += 1
+
+
+def BenchAI(counts: List[int], frames: int) -> List[dict]:
+	"""PongAI.Controls for the 4 paddles, reactive and predictive
+	- a decision every frame: with its usual reaction, 0.4 would mostly return the previous buttons
+	"""
+	results = []
+	for count in counts:
+		for difficulty in (0.4, 1.0):
+			pong = SeededPong(count)
+			ai   = PongAI(pong, difficulty)
+			ids  = [0, 1, 2, 3]
+
+			# cost per decision, not the cached buttons in between
+			ai.reaction = 1
+
+			def Step():
+				pong.Physics()
+				start = perf_counter()
+				ai.Controls(ids)
+				return perf_counter() - start
+
+			times = [Step() for _ in range(frames)]
+			results.append({
+				'bench': 'ai',
+				'balls': count,
+				'predict': ai.predict,
+				'reaction': ai.reaction,
+				'frames': frames,
+				'controlsUs': Median(times) * 1e6,
+				'controlsUs95': Percentile(times, 95) * 1e6,
+			})
+
+	return results
+
+
+def BenchCapture(filename: str, target: str, repeat: int) -> List[dict]:
+	"""Captured datagrams through the server or client receive handlers, as fast as possible, no sockets
+	- latency per message kind, allocations from a 2nd pass under tracemalloc
+	"""
+	packets = ReadCapture(filename)
+	if not packets: return []
+
+	def Run(profiler: Profiler or None) -> float:
+		seed(0)
+		if target == 'server':
+			pong    = PongServer(bots=0)
+			handler = pong.UdpOnRead
+		else:
+			pong    = PongPeer()
+			handler = pong.UdpClientRead
+		pong.udpHandle = SinkUdp()
+
+		start = perf_counter()
+		# the handlers print some messages
+		with redirect_stdout(io.StringIO()):
+			for _ in range(repeat):
+				for _, address, data in packets:
+					if profiler:
+						profiler.Start()
+						handler(None, address, 0, data, 0)
+						profiler.Lap(chr(data[UdpHeader.structSize]) if len(data) > UdpHeader.structSize else '?')
+					else:
+						handler(None, address, 0, data, 0)
+
+		return perf_counter() - start
+
+	profiler    = Profiler(size=len(packets) * repeat)
+	collections = gc.get_stats()[0]['collections']
+	elapsed     = Run(profiler)
+	collections = gc.get_stats()[0]['collections'] - collections
+
+	tracemalloc.start()
+	blocks = sys.getallocatedblocks()
+	Run(None)
+	blocks  = sys.getallocatedblocks() - blocks
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	numPacket = len(packets) * repeat
+	numByte   = sum(len(data) for _, _, data in packets) * repeat
+	return [{
+		'bench': 'capture',
+		'target': target,
+		'packets': numPacket,
+		'packetsPerSec': numPacket / elapsed,
+		'mbPerSec': numByte / elapsed / 1e6,
+		'handlerMs': profiler.Stats(),
+		'allocPeakBytes': peak,
+		'allocBlocksNet': blocks,
+		'gcCollections': collections,
+	}]
+
+
+def BenchChaos(counts: List[int], frames: int) -> List[dict]:
+	"""Server tick time and bytes per tick as the number of balls grows
+	"""
+	results = []
+	for count in counts:
+		seed(count)
+		server           = PongServer(ball_pool=count)
+		server.udpHandle = sink = SinkUdp()
+		server.slots     = [('127.0.0.1', 10000 + i) for i in range(4)]
+		server.NewGame()
+		server.SetBalls(count)
+
+		sink.bytes   = 0
+		sink.packets = 0
+		ticks        = []
+
+		for _ in range(frames):
+			start = perf_counter()
+			server.dirtyBall.clear()
+			server.dirtyPaddle = 0
+			server.dirtyWall   = 0
+			server.Physics()
+			server.ShareDirty()
+			ticks.append(perf_counter() - start)
+
+		results.append({
+			'bench': 'chaos',
+			'balls': count,
+			'frames': frames,
+			'tickMs': sum(ticks) / frames * 1000,
+			'tickMs95': Percentile(ticks, 95) * 1000,
+			'bytesPerTick': sink.bytes / frames,
+			'packetsPerTick': sink.packets / frames,
+		})
+
+	return results
+
+
+def BenchCodec(frames: int) -> List[dict]:
+	"""Network codecs: Format + Parse per object
+	"""
+	pong    = SeededPong(1)
+	ball    = pong.balls[0]
+	paddle  = pong.paddles[0]
+	results = []
+	repeat  = frames * 100
+
+	for name, obj, format_, parse in (
+			('body', paddle, lambda: Body.Format(paddle), lambda message: Body.Parse(paddle, message)),
+			('ball', ball, ball.Format, ball.Parse),
+			('paddle', paddle, paddle.Format, paddle.Parse)):
+		message = format_()
+		start   = perf_counter()
+		for _ in range(repeat): format_()
+		middle  = perf_counter()
+		for _ in range(repeat): parse(message)
+		end     = perf_counter()
+
+		results.append({
+			'bench': 'codec',
+			'object': name,
+			'bytes': len(message),
+			'formatUs': (middle - start) / repeat * 1e6,
+			'parseUs': (end - middle) / repeat * 1e6,
+		})
+
+	return results
+
+
+def BenchContact(counts: List[int], frames: int) -> List[dict]:
+	"""Contact callback under heavy collisions: all the balls packed around the sun
+	"""
+	results = []
+	for count in counts:
+		pong = SeededPong(count)
+		for ball in pong.balls:
+			ball.body.position       = (ball.body.position[0] * 0.3, ball.body.position[1] * 0.3)
+			ball.body.linearVelocity = (ball.body.linearVelocity[0] * 3, ball.body.linearVelocity[1] * 3)
+
+		calls   = 0
+		elapsed = 0.0
+		contact = pong.Contact
+
+		def Timed(*args):
+			nonlocal calls, elapsed
+			start    = perf_counter()
+			contact(*args)
+			elapsed += perf_counter() - start
+			calls   += 1
+
+		pong.Contact = Timed
+		start        = perf_counter()
+		for _ in range(frames): pong.Physics()
+		total = perf_counter() - start
+
+		results.append({
+			'bench': 'contact',
+			'balls': count,
+			'frames': frames,
+			'contactsPerFrame': calls / frames,
+			'contactUs': elapsed / max(calls, 1) * 1e6,
+			'frameMs': total / frames * 1000,
+		})
+
+	return results
+
+
+def BenchEnv(numEnvs: List[int], steps: int, opponents: bool) -> List[dict]:
+	"""Env-steps per second of PongEnv
+	"""
+	results = []
+	for numEnv in numEnvs:
+		env     = PongEnv(numEnv=numEnv, opponents=opponents, seed=numEnv)
+		actions = np.random.default_rng(numEnv).integers(0, 5, (steps, numEnv))
+		env.reset()
+
+		start = perf_counter()
+		for i in range(steps): env.step(actions[i])
+		elapsed = perf_counter() - start
+
+		results.append({
+			'bench': 'env',
+			'envs': numEnv,
+			'opponents': opponents,
+			'steps': steps,
+			'stepsPerSec': numEnv * steps / elapsed,
+		})
+
+	return results
+
+
+def BenchInterpolate(counts: List[int], frames: int) -> List[dict]:
+	"""Interpolate between 2 physics frames, per render frame
+	"""
+	results = []
+	for count in counts:
+		pong = SeededPong(count)
+		pong.InterpolateStore()
+		pong.Physics()
+		pong.sdelta = 4
+		pong.frame  = pong.pframe + 2
+
+		start = perf_counter()
+		for _ in range(frames): pong.Interpolate(True)
+		elapsed = perf_counter() - start
+
+		results.append({
+			'bench': 'interpolate',
+			'balls': count,
+			'frames': frames,
+			'interpolateUs': elapsed / frames * 1e6,
+		})
+
+	return results
+
+
+def BenchPhysics(counts: List[int], frames: int) -> List[dict]:
+	"""Pong.Physics step cost as the number of balls grows
+	"""
+	results = []
+	for count in counts:
+		pong  = SeededPong(count)
+		times = []
+		for _ in range(frames):
+			start = perf_counter()
+			pong.Physics()
+			times.append(perf_counter() - start)
+
+		results.append({
+			'bench': 'physics',
+			'balls': count,
+			'frames': frames,
+			'stepMs': Median(times) * 1000,
+			'stepMs95': Percentile(times, 95) * 1000,
+		})
+
+	return results
+
+
+def BenchRender(counts: List[int], frames: int, names: List[str], size: int) -> List[dict]:
+	"""Renderers: arena layer + paddles + balls + present
+	- basic: dummy SDL video driver, opengl: offscreen driver + EGL, llvmpipe when there is no GPU
+	- the 1st frame is checked against RendererBasic drawing on a plain surface, see RenderCheck
+	"""
+	# pygame is only needed here, the other scenarios stay headless
+	if 'opengl' in names: os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+	import pygame
+	from renderer_basic import RendererBasic
+
+	scale   = size / 12
+	results = []
+
+	for name in names:
+		# the video driver is chosen by display.init
+		pygame.display.quit()
+		os.environ['SDL_VIDEODRIVER'] = 'offscreen' if name == 'opengl' else 'dummy'
+		pygame.display.init()
+
+		for count in counts:
+			for dirty in ((0, 1) if name == 'basic' else (0,)):
+				with redirect_stdout(io.StringIO()):
+					if name == 'opengl':
+						from OpenGL import GL
+						from renderer_opengl import RendererOpenGL
+						renderer = RendererOpenGL()
+					else:
+						renderer = RendererBasic(dirty=dirty)
+				renderer.Init(pygame.display.set_mode((size, size), renderer.flags))
+				renderer.SetView(scale, size / 2)
+
+				pong = SeededPong(count)
+				wall = renderer.ToScreen(np.array(pong.wall.fixtures[0].shape.vertices))
+				RenderLayer(renderer, wall)
+
+				# states are computed upfront, only the drawing is timed
+				states = []
+				for _ in range(frames):
+					pong.Physics()
+					states.append((
+						np.array([tuple(ball.body.position) + (ball.body.angle,) for ball in pong.balls]),
+						np.array([tuple(paddle.body.position) + (paddle.body.angle,) for paddle in pong.paddles]),
+					))
+
+				# untimed 1st frame: checked, fills the caches
+				RenderFrame(renderer, *states[0], scale)
+				pixelDiff = RenderCheck(renderer, wall, *states[0], scale)
+				renderer.Present()
+
+				times = []
+				for balls, paddles in states:
+					start = perf_counter()
+					RenderFrame(renderer, balls, paddles, scale)
+					renderer.Present()
+					# llvmpipe or a GPU draws asynchronously, wait for the frame
+					if name == 'opengl': GL.glFinish()
+					times.append(perf_counter() - start)
+
+				results.append({
+					'bench': 'render',
+					'renderer': name,
+					'size': size,
+					'balls': count,
+					'dirty': dirty,
+					'frames': frames,
+					'frameMs': Median(times) * 1000,
+					'frameMs95': Percentile(times, 95) * 1000,
+					'pixelDiff': pixelDiff,
+				})
+
+	pygame.display.quit()
+	return results
+
+
+def BenchShare(counts: List[int], frames: int) -> List[dict]:
+	"""ShareObjects + ShareBalls fan-out as the number of receiving clients grows
+	"""
+	results = []
+	for count in counts:
+		seed(count)
+		with redirect_stdout(io.StringIO()):
+			server = PongServer(ball_pool=16, bots=0)
+		server.udpHandle = sink = SinkUdp()
+		server.slots     = [('127.0.0.1', 10000 + i) for i in range(count)]
+		server.SetBalls(16)
+
+		start = perf_counter()
+		for _ in range(frames):
+			server.ShareObjects(server.paddles, -1)
+			server.ShareBalls(None)
+		elapsed = perf_counter() - start
+
+		results.append({
+			'bench': 'share',
+			'clients': count,
+			'frames': frames,
+			'shareUs': elapsed / frames * 1e6,
+			'packetsPerFrame': sink.packets / frames,
+		})
+
+	return results
+
+
+def BenchStartup(modes: List[str], repeat: int) -> List[dict]:
+	"""Start a fresh interpreter per mode, import its entry point like __main__ does
+	- startupMs: whole process, importMs: MainMode only, rssMb: peak resident memory
+	- VmHWM rather than ru_maxrss, which keeps the peak of the forked parent across exec
+	"""
+	folder = os.path.dirname(os.path.abspath(__file__))
+	code   = '\n'.join([
+		'import importlib.util, json, os, resource, sys, time',
+		'start = time.perf_counter()',
+		'spec = importlib.util.spec_from_file_location("pong_main", "__main__.py")',
+		'main = importlib.util.module_from_spec(spec)',
+		'spec.loader.exec_module(main)',
+		'main.MainMode(set(sys.argv[1:]))',
+		'rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss',
+		'if os.path.exists("/proc/self/status"):',
+		'	rss = int(next(line for line in open("/proc/self/status") if line.startswith("VmHWM")).split()[1])',
+		'print(json.dumps({',
+		'	"importMs": (time.perf_counter() - start) * 1000,',
+		'	"rssMb": rss / 1024,',
+		'	"pygame": "pygame" in sys.modules,',
+		'}))',
+	])
+	argsSets = {
+		'client': [],
+		'loadtest': ['loadtest'],
+		'proxy': ['proxy'],
+		'replay': ['headless', 'replay'],
+		'server': ['server'],
+		'version': ['version'],
+	}
+
+	results = []
+	for mode in modes:
+		runs = []
+		for _ in range(repeat):
+			start  = perf_counter()
+			output = subprocess.run([sys.executable, '-c', code, *argsSets[mode]], cwd=folder, capture_output=True, text=True, check=True).stdout
+			runs.append((perf_counter() - start, json.loads(output.strip().splitlines()[-1])))
+
+		results.append({
+			'bench': 'startup',
+			'mode': mode,
+			'pygame': runs[0][1]['pygame'],
+			'startupMs': Median([elapsed for elapsed, _ in runs]) * 1000,
+			'importMs': Median([run['importMs'] for _, run in runs]),
+			'rssMb': Median([run['rssMb'] for _, run in runs]),
+		})
+
+	return results
+
+
+def Compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+	"""Regressions against a baseline, results are matched on their non-metric fields
+	:param tolerance: in %
+	"""
+	def Key(result: dict) -> tuple:
+		return tuple(sorted((key, value) for key, value in result.items() if key in BENCH_PARAMS))
+
+	bases       = {Key(base): base for base in baseline}
+	regressions = []
+	for result in results:
+		if not (base := bases.get(Key(result))): continue
+
+		for name, value in result.items():
+			if not isinstance(value, float) or not (old := base.get(name)): continue
+			change = (value - old) / old * 100
+			if (METRIC_LOWER.search(name) and change > tolerance) or (METRIC_HIGHER.search(name) and change < -tolerance):
+				regressions.append(f'{result["bench"]} {Key(result)} {name}: {old:.4g} => {value:.4g} ({change:+.1f}%)')
+
+	return regressions
+
+
+def Counts(text: str) -> List[int]:
+	return [int(count) for count in str(text).split(',')]
+
+
+def Median(values: List[float]) -> float:
+	return Percentile(values, 50)
+
+
+def RenderCheck(renderer, wall: np.ndarray, balls: np.ndarray, paddles: np.ndarray, scale: float) -> float:
+	"""Compare the frame being drawn with RendererBasic on a plain surface, before Present
+	:return: fraction of the drawn pixels with a channel off by more than RENDER_TOLERANCE
+	"""
+	import pygame
+	from renderer_basic import RendererBasic
+
+	size = renderer.size
+	if renderer.name == 'opengl':
+		from OpenGL import GL
+		data  = GL.glReadPixels(0, 0, size[0], size[1], GL.GL_RGB, GL.GL_UNSIGNED_BYTE)
+		frame = np.frombuffer(data, dtype=np.uint8).reshape(size[1], size[0], 3)[::-1]
+	else:
+		frame = pygame.surfarray.array3d(renderer.screen).transpose(1, 0, 2)
+
+	with redirect_stdout(io.StringIO()):
+		reference = RendererBasic()
+	reference.Init(pygame.Surface(size))
+	reference.SetView(scale, size[0] / 2)
+	RenderLayer(reference, wall)
+	RenderFrame(reference, balls, paddles, scale)
+	expect = pygame.surfarray.array3d(reference.screen).transpose(1, 0, 2)
+
+	# 1 pixel shifts are fine: the rasterizers round differently
+	height, width = expect.shape[:2]
+	frame  = frame.astype(np.int16)
+	padded = np.pad(expect, ((1, 1), (1, 1), (0, 0)), mode='edge')
+	off    = np.min([
+		np.abs(frame - padded[1 + dy: 1 + dy + height, 1 + dx: 1 + dx + width]).max(axis=2)
+		for dy in (-1, 0, 1) for dx in (-1, 0, 1)], axis=0) > RENDER_TOLERANCE
+	drawn  = (expect != RENDER_CLEAR).any(axis=2) | (frame != RENDER_CLEAR).any(axis=2)
+	diff   = off.sum() / max(drawn.sum(), 1)
+
+	# a missing object would be lost in the total: mean color of a 9x9 patch at every center, a ball line moved by 1 pixel barely changes it
+	centers = np.rint(renderer.ToScreen(np.concatenate([balls[:, :2], paddles[:, :2]]))).astype(np.int64)
+	centers = np.clip(centers, 4, np.array([width, height]) - 5)
+	patches = [np.array([image[y - 4: y + 5, x - 4: x + 5].reshape(-1, 3).mean(axis=0) for x, y in centers]) for image in (frame, expect)]
+	missing = int((np.abs(patches[0] - patches[1]).max(axis=1) > RENDER_TOLERANCE).sum())
+
+	if diff > RENDER_DIFF or missing:
+		raise RuntimeError(f'{renderer.name}: {diff * 100:.2f}% of the drawn pixels and {missing} object(s) differ from the reference')
+	return float(diff)
+
+
+def RenderFrame(renderer, balls: np.ndarray, paddles: np.ndarray, scale: float):
+	"""Layer + paddles + balls, without Present
+	"""
+	renderer.DrawLayer()
+	renderer.DrawQuads(renderer.ToScreen(paddles[:, :2]), (0.08 * scale, 0.64 * scale), paddles[:, 2], (255, 200, 0))
+	renderer.DrawCircles(renderer.ToScreen(balls[:, :2]), 0.1 * scale, balls[:, 2], (0, 220, 0), True)
+	renderer.Flush()
+
+
+def RenderLayer(renderer, wall: np.ndarray):
+	renderer.BeginLayer()
+	renderer.Clear(RENDER_CLEAR)
+	renderer.DrawLines(wall, np.roll(wall, -1, axis=0), (240, 200, 200), 8)
+	renderer.EndLayer()
+
+
+def SeededPong(count: int) -> Pong:
+	"""Same world at every run: ball throws come from random
+	"""
+	seed(count)
+	with redirect_stdout(io.StringIO()):
+		pong = Pong(ball_pool=count)
+	pong.SetBalls(count)
+	pong.ResetBalls()
+	return pong
+
+
+def main():
+	parser = ArgumentParser(description='Battle Pong benchmark', prog='python benchmark.py')
+	add    = parser.add_argument
+
+	add('--ai'         , nargs='?', default=''      , const='1,16,64'        , type=str  , help='AI: ball counts')
+	add('--all'        , nargs='?', default=0       , const=1                , type=int  , help='Run the whole suite')
+	add('--baseline'   , nargs='?', default=''      ,                          type=str  , help='Compare against this JSON output')
+	add('--capture'    , nargs='?', default=''      ,                          type=str  , help='Replay a capture file')
+	add('--chaos'      , nargs='?', default=''      , const='1,16,64,256,512', type=str  , help='Ball counts, comma separated')
+	add('--codec'      , nargs='?', default=0       , const=1                , type=int  , help='Format/Parse of the network messages')
+	add('--contact'    , nargs='?', default=''      , const='64,256'         , type=str  , help='Contact: ball counts')
+	add('--env'        , nargs='?', default=''      , const='1,16,64'        , type=str  , help='Env counts, comma separated')
+	add('--frames'     , nargs='?', default=240     ,                          type=int  , help='Frames per scenario')
+	add('--interpolate', nargs='?', default=''      , const='1,64,256'       , type=str  , help='Interpolate: ball counts')
+	add('--opponents'  , nargs='?', default=0       , const=1                , type=int  , help='Env: AI opponents')
+	add('--output'     , nargs='?', default=''      ,                          type=str  , help='Write JSON results to this file')
+	add('--physics'    , nargs='?', default=''      , const='1,16,64,256'    , type=str  , help='Physics: ball counts')
+	add('--render'     , nargs='?', default=''      , const='1,64,256'       , type=str  , help='Render: ball counts, frames checked against RendererBasic')
+	add('--renderer'   , nargs='?', default='basic' ,                          type=str  , help='Render: basic,opengl, opengl runs headless with EGL')
+	add('--repeat'     , nargs='?', default=10      ,                          type=int  , help='Capture: passes over the packets')
+	add('--share'      , nargs='?', default=''      , const='1,4,16,64'      , type=str  , help='Share: client counts')
+	add('--size'       , nargs='?', default=1280    ,                          type=int  , help='Render: window size in pixels')
+	add('--startup'    , nargs='?', default=''      , const='server,client'  , type=str  , help='Startup time + RSS per mode: version,server,proxy,loadtest,replay,client')
+	add('--target'     , nargs='?', default='server',                          type=str  , help='Capture: receive handler', choices=['client', 'server'])
+	add('--tolerance'  , nargs='?', default=10.0    ,                          type=float, help='Baseline: allowed slowdown, in %%')
+
+	args    = parser.parse_args()
+	results = []
+	# the JSON results only
+	logger.level = LOG_WARNING
+	frames  = args.frames
+
+	if args.all:
+		for name, value in BENCH_ALL.items():
+			if not getattr(args, name): setattr(args, name, value)
+
+	if args.ai:
+		results += BenchAI(Counts(args.ai), frames)
+
+	if args.capture:
+		results += BenchCapture(args.capture, args.target, args.repeat)
+
+	if args.chaos:
+		results += BenchChaos(Counts(args.chaos), frames)
+
+	if args.codec:
+		results += BenchCodec(frames)
+
+	if args.contact:
+		results += BenchContact(Counts(args.contact), frames)
+
+	if args.env:
+		results += BenchEnv(Counts(args.env), frames, bool(args.opponents))
+
+	if args.interpolate:
+		results += BenchInterpolate(Counts(args.interpolate), frames)
+
+	if args.physics:
+		results += BenchPhysics(Counts(args.physics), frames)
+
+	if args.render:
+		results += BenchRender(Counts(args.render), frames, args.renderer.split(','), args.size)
+
+	if args.share:
+		results += BenchShare(Counts(args.share), frames)
+
+	if args.startup:
+		results += BenchStartup(args.startup.split(','), min(args.repeat, 5))
+
+	for result in results: print(json.dumps(result))
+
+	if args.output:
+		with open(args.output, 'w') as file:
+			json.dump(results, file, indent=2)
+
+	if args.baseline:
+		with open(args.baseline) as file:
+			regressions = Compare(results, json.load(file), args.tolerance)
+		for regression in regressions: print('REGRESSION', regression)
+		print(f'baseline: {len(regressions)} regression(s), tolerance={args.tolerance}%')
+		if regressions: sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
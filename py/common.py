@@ -6,6 +6,20 @@
 Common functions
 """
 
+from typing import List
+
+
+def DefaultFloat(value: float or str, default: float = None):
+	if isinstance(value, float): return value
+	if value is None: return default
+
+	try:
+		value = float(value)
+	except (TypeError, ValueError):
+		value = default
+
+	return value
+
 
 def DefaultInt(value: int or str, default: int = None):
 	if isinstance(value, int): return value
@@ -17,3 +31,9 @@ def DefaultInt(value: int or str, default: int = None):
 		value = default
 
 	return value
+
+
+def Percentile(values: List[float], percent: float) -> float:
+	if not values: return 0.0
+	values = sorted(values)
+	return values[min(int(len(values) * percent / 100), len(values) - 1)]
@@ -0,0 +1,156 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Log
+- structured events: level + name + fields, written as text or JSON lines, to stdout or a file
+- the caller only appends a tuple to a ring buffer, a background thread formats and writes
+- rate limit per event name: LOG_RATE per sec, the suppressed count goes with the next accepted event
+- disabled levels cost one comparison: if logger.level <= LOG_DEBUG: logger.Debug(...)
+"""
+
+import atexit
+from collections import deque
+import json
+import sys
+import threading
+from time import strftime, localtime, time
+
+LOG_BUFFER  = 4096                          # ring buffer, the oldest events are dropped when full
+LOG_DEBUG   = 10
+LOG_ERROR   = 40
+LOG_FLUSH   = 0.1                           # background write every x sec
+LOG_INFO    = 20
+LOG_RATE    = 20                            # max events per sec, per event name
+LOG_WARNING = 30
+
+LOG_LEVELS = {
+	'debug': LOG_DEBUG,
+	'info': LOG_INFO,
+	'warning': LOG_WARNING,
+	'error': LOG_ERROR,
+}
+LOG_NAMES = {value: key.upper() for key, value in LOG_LEVELS.items()}
+
+
+class Logger:
+	def __init__(self, level: int = LOG_INFO, format: str = 'text', filename: str = '', rate: int = LOG_RATE):
+		self.buffer   = deque(maxlen=LOG_BUFFER)  # (time, level, event, fields)
+		self.dropped  = 0                   # events lost to a full buffer
+		self.file     = None
+		self.filename = filename
+		self.format   = format
+		self.level    = level
+		self.limits   = {}                  # event => [window start, count, suppressed]
+		self.lock     = threading.Lock()    # Flush runs in the thread and in Close
+		self.rate     = rate
+		self.thread   = None                # type: threading.Thread
+		self.wake     = threading.Event()
+
+		atexit.register(self.Close)
+
+	def Close(self):
+		"""Stop the thread and write what is left
+		"""
+		if self.thread:
+			self.thread = None
+			self.wake.set()
+		self.Flush()
+		if self.file and self.file is not sys.stdout:
+			self.file.close()
+		self.file = None
+
+	def Flush(self):
+		buffer = self.buffer
+		if not buffer and not self.dropped: return
+
+		with self.lock:
+			if not self.file: self.file = open(self.filename, 'a') if self.filename else sys.stdout
+
+			lines = []
+			while buffer:
+				lines.append(self.Format(*buffer.popleft()))
+			if self.dropped:
+				lines.append(self.Format(time(), LOG_WARNING, 'log_dropped', {'count': self.dropped}))
+				self.dropped = 0
+
+			# closed pipe or full disk: the game goes on without its log
+			try:
+				self.file.write(''.join(lines))
+				self.file.flush()
+			except (OSError, ValueError):
+				pass
+
+	def Format(self, now: float, level: int, event: str, fields: dict) -> str:
+		if self.format == 'json':
+			record = {'time': round(now, 4), 'level': LOG_NAMES[level], 'event': event, **fields}
+			try:
+				return json.dumps(record, default=repr) + '\n'
+			# non string keys
+			except (TypeError, ValueError):
+				return json.dumps({key: repr(value) for key, value in record.items()}) + '\n'
+
+		text = ' '.join(f'{key}={value}' for key, value in fields.items())
+		return f'{strftime("%H:%M:%S", localtime(now))}.{int(now * 1000) % 1000:03d} {LOG_NAMES[level]:7} {event} {text}\n'
+
+	def Log(self, level: int, event: str, fields: dict):
+		"""Queue an event, never blocks
+		"""
+		if level < self.level: return
+
+		now = time()
+		if self.rate > 0:
+			if not (limit := self.limits.get(event)):
+				limit = self.limits[event] = [now, 0, 0]
+			if now - limit[0] >= 1:
+				limit[0] = now
+				limit[1] = 0
+			if limit[1] >= self.rate:
+				limit[2] += 1
+				return
+			limit[1] += 1
+			if limit[2]:
+				fields['suppressed'] = limit[2]
+				limit[2]             = 0
+
+		buffer = self.buffer
+		if len(buffer) == LOG_BUFFER: self.dropped += 1
+		buffer.append((now, level, event, fields))
+
+		if not self.thread: self.Start()
+
+	def Run(self):
+		while self.thread:
+			self.wake.wait(LOG_FLUSH)
+			self.Flush()
+
+	def Setup(self, **kwargs):
+		"""Options from the command line
+		"""
+		self.filename = kwargs.get('log_file') or ''
+		self.format   = kwargs.get('log_format') or 'text'
+		self.level    = LOG_LEVELS.get(str(kwargs.get('log_level')), LOG_INFO)
+
+	def Start(self):
+		self.thread = threading.Thread(target=self.Run, name='log', daemon=True)
+		self.thread.start()
+
+	# LEVELS
+	########
+
+	def Debug(self, event: str, /, **fields):
+		self.Log(LOG_DEBUG, event, fields)
+
+	def Error(self, event: str, /, **fields):
+		self.Log(LOG_ERROR, event, fields)
+
+	def Info(self, event: str, /, **fields):
+		self.Log(LOG_INFO, event, fields)
+
+	def Warning(self, event: str, /, **fields):
+		self.Log(LOG_WARNING, event, fields)
+
+
+# shared by all the modules, configured once by Setup
+logger = Logger()
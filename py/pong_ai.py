@@ -0,0 +1,253 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong AI
+- shared by server (bots in empty slots) and client (offline + AI control)
+- all AI paddles are evaluated against all balls at once, with numpy
+- predictive mode: ball paths are integrated only when a bounce/reset changes them, AI_PREDICT_BATCH per tick at most,
+  the intercept on each paddle line is then shared by every AI paddle
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from pong_common import BALL_X2, BUTTON_DOWN, BUTTON_L1, BUTTON_LEFT, BUTTON_R1, BUTTON_RIGHT, BUTTON_UP, \
+	PADDLE_FAR2, PADDLE_NEAR2, PADDLE_Y2, PHYSICS_FPS, PHYSICS_STEP, Pong, ZONE_X2, ZONE_Y2
+
+AI_ERROR          = 2                                   # extra aim error at difficulty 0, in paddle half lengths
+AI_OFFSETS        = np.arange(-2, 3, dtype=np.float64)  # mirrored zones: the ball can come from the neighbours
+AI_PREDICT        = 0.5                                 # min difficulty to predict trajectories
+AI_PREDICT_BATCH  = 32                                  # max paths integrated per tick, the others wait for the next ticks
+AI_PREDICT_FRAMES = PHYSICS_FPS * 3 // 2                # prediction horizon
+AI_PREDICT_MAX    = PHYSICS_FPS                         # predict again after that many frames, even without contact
+AI_PREDICT_STEP   = 8                                   # physics frames per integration step
+AI_REACTION       = 15                                  # frames between decisions at difficulty 0
+BALL_LIMIT        = ZONE_X2 - BALL_X2                   # ball center bounces there
+BALL_RESTITUTION  = 0.95
+TIMEOUT_ANGLE     = int(0.4 * PHYSICS_FPS)              # in physics frames
+TIMEOUT_MOVE      = int(0.6 * PHYSICS_FPS)
+
+
+class PongAI:
+	def __init__(self, pong: Pong, difficulty: float = 1.0, rng: np.random.Generator = None):
+		"""
+		:param difficulty: 1 = best, 0 = slow reactions + poor aim, predicts trajectories from AI_PREDICT
+		:param rng: seeded generator for reproducible decisions, otherwise a fresh one
+		"""
+		self.difficulty = min(max(difficulty, 0.0), 1.0)
+		self.pong       = pong
+		self.predict    = self.difficulty >= AI_PREDICT
+		self.reaction   = int((1 - self.difficulty) * AI_REACTION + 0.5) + 1
+		self.spread     = (1 + (1 - self.difficulty) * AI_ERROR) * PADDLE_Y2
+
+		numPaddle = len(pong.paddles)
+		horiz     = np.array([paddle.angle0 > 0 for paddle in pong.paddles])
+
+		self.horiz     = horiz
+		self.position0 = np.array([paddle.position0 for paddle in pong.paddles], dtype=np.float64)
+		self.offsets   = np.stack([                 # [paddle, zone, xy]
+			np.outer(horiz, AI_OFFSETS * ZONE_X2),
+			np.outer(~horiz, AI_OFFSETS * ZONE_Y2),
+		], axis=2)
+
+		# paddle lines, crossed by the ball when coming towards the wall
+		self.axis     = horiz.astype(np.int64)      # 1 => line is y = lines
+		self.ballMass = pong.pool[0].body.mass
+		self.lines    = self.position0[np.arange(numPaddle), self.axis]
+		self.signs    = np.sign(self.lines)
+
+		# predicted paths, per pooled ball: when, then where each paddle line will be crossed
+		numPool        = len(pong.pool)
+		self.pathCoord = np.zeros((numPool, numPaddle))
+		self.pathFrame = np.full(numPool, -AI_PREDICT_MAX - 1, dtype=np.int64)
+		self.pathTime  = np.full((numPool, numPaddle), np.inf)
+
+		self.buttons   = np.zeros(numPaddle, dtype=np.int64)
+		self.randAngle = np.full(numPaddle, 0.5)    # decide to rotate
+		self.randMove  = np.full(numPaddle, 0.5)    # decide edge or center
+		self.rng       = rng or np.random.default_rng()
+		self.tick      = 0                          # physics frames seen, replaces time()
+		self.tickAngle = np.zeros(numPaddle, dtype=np.int64)
+		self.tickMove  = np.zeros(numPaddle, dtype=np.int64)
+
+	def Balls(self, bids: np.ndarray = None) -> np.ndarray:
+		"""Ball positions and velocities: [ball, (x, y, vx, vy)]
+		:param bids: only those balls, otherwise all active balls
+		"""
+		balls  = self.pong.balls
+		values = []
+		for ball in (balls if bids is None else [balls[bid] for bid in bids]):
+			body = ball.body
+			pos  = body.position
+			vel  = body.linearVelocity
+			values += (pos[0], pos[1], vel[0], vel[1])
+
+		return np.array(values, dtype=np.float64).reshape(-1, 4)
+
+	def Controls(self, ids: List[int]) -> np.ndarray:
+		"""Button masks for the given paddles, one call per physics frame
+		"""
+		self.tick += 1
+		if not ids: return np.zeros(0, dtype=np.int64)
+
+		ids = np.asarray(ids, dtype=np.int64)
+
+		# easier AI => keep the previous decision for a few frames
+		if self.tick % self.reaction: return self.buttons[ids]
+
+		paddles = self.pong.paddles
+		horiz   = self.horiz[ids]
+		pos0    = self.position0[ids]
+		ppos    = np.array([tuple(paddles[id].body.position) for id in ids], dtype=np.float64).reshape(-1, 2)
+		alive   = np.array([paddles[id].alive for id in ids], dtype=bool)
+
+		# 1) find the ball to play
+		if self.predict:
+			target, hasBall, coord = self.Intercepts(ids, pos0)
+		else:
+			balls = self.Balls()
+
+			# closest ball coming towards us: [paddle, zone, ball]
+			bpos  = balls[:, :2]
+			d0    = bpos[None, :, :] - pos0[:, None, :]
+			d1    = d0[:, None, :, :] - self.offsets[ids][:, :, None, :]
+			dist2 = d1[..., 0] * d1[..., 0] + d1[..., 1] * d1[..., 1] + 0.1
+			dots  = (d1[..., 0] * balls[:, 2] + d1[..., 1] * balls[:, 3]) / dist2
+			dots  = np.minimum(dots.min(axis=1), 1000)
+
+			best    = dots.argmin(axis=1)
+			hasBall = dots[np.arange(len(ids)), best] < 0
+			target  = np.where(hasBall[:, None], bpos[best], pos0)
+
+		# 2) move
+		delta = target - ppos
+		dx    = delta[:, 0]
+		dy    = delta[:, 1]
+		dist2 = dx * dx + dy * dy
+
+		randMove = self.RandomDecision(self.randMove, self.tickMove, ids, TIMEOUT_MOVE) - 0.5
+		far      = dist2 < PADDLE_FAR2
+
+		# ball behind => give it some space
+		flipX = far & np.where(pos0[:, 1] < 0, dy < 0, dy > 0)
+		flipY = far & np.where(pos0[:, 0] < 0, dx < 0, dx > 0)
+		dx    = np.where(flipX, -dx, dx)
+		dy    = np.where(flipY, -dy, dy)
+
+		# ball still far => wait where it will cross our line
+		if self.predict:
+			intercept = hasBall & ~far
+			dx        = np.where(intercept & horiz, coord - ppos[:, 0], dx)
+			dy        = np.where(intercept & ~horiz, coord - ppos[:, 1], dy)
+
+		moveX = dx + randMove * self.spread
+		moveY = dy + randMove * self.spread
+
+		buttons = np.where(
+			horiz,
+			np.where(moveX > 0, BUTTON_RIGHT, np.where(moveX < 0, BUTTON_LEFT, 0)),
+			np.where(moveY > 0, BUTTON_UP, np.where(moveY < 0, BUTTON_DOWN, 0)),
+		)
+
+		# 3) rotate hit?
+		randAngle = self.RandomDecision(self.randAngle, self.tickAngle, ids, TIMEOUT_ANGLE)
+		buttons  |= np.where(dist2 < PADDLE_NEAR2, np.where(randAngle > 0.5, BUTTON_L1, BUTTON_R1), 0)
+
+		buttons           = np.where(alive, buttons, 0)
+		self.buttons[ids] = buttons
+		return buttons
+
+	def Intercepts(self, ids: np.ndarray, pos0: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+		"""Earliest ball to cross each paddle line, from the cached paths
+		:return: ball positions (or pos0), has a ball, coordinate along the paddle line
+		"""
+		self.Predict()
+
+		numBall = len(self.pong.balls)
+		age     = self.tick - self.pathFrame[:numBall]
+		remain  = self.pathTime[:numBall, ids] - age[:, None]
+		remain  = np.where(remain > 0, remain, np.inf)
+
+		best    = remain.argmin(axis=0)
+		columns = np.arange(len(ids))
+		hasBall = np.isfinite(remain[best, columns])
+		target  = np.where(hasBall[:, None], self.Balls(best)[:, :2], pos0)
+		return target, hasBall, self.pathCoord[best, ids]
+
+	def Predict(self):
+		"""Integrate the paths of the balls that changed (wall/paddle bounce, reset, network) with sun gravity + wall bounces,
+		until they cross the paddle lines
+		"""
+		pong    = self.pong
+		numBall = len(pong.balls)
+		dirty   = np.array([bid for bid in pong.dirtyPath if bid < numBall], dtype=np.int64)
+		pong.dirtyPath.clear()
+
+		# the pool grew: a server sent more balls than our options planned
+		if (grow := numBall - len(self.pathFrame)) > 0:
+			numPaddle      = len(self.lines)
+			self.pathCoord = np.concatenate([self.pathCoord, np.zeros((grow, numPaddle))])
+			self.pathFrame = np.concatenate([self.pathFrame, np.full(grow, -AI_PREDICT_MAX - 1, dtype=np.int64)])
+			self.pathTime  = np.concatenate([self.pathTime, np.full((grow, numPaddle), np.inf)])
+
+		aged = np.nonzero(self.pathFrame[:numBall] + AI_PREDICT_MAX <= self.tick)[0]
+		if not len(aged) and not len(dirty): return
+
+		# contacts first, then the oldest paths, the rest is spread over the next ticks
+		if len(aged) and len(dirty): aged = np.setdiff1d(aged, dirty, assume_unique=True)
+		bids = np.concatenate([dirty, aged[np.argsort(self.pathFrame[aged], kind='stable')]])[:AI_PREDICT_BATCH]
+		pong.dirtyPath.update(dirty[AI_PREDICT_BATCH:].tolist())
+
+		axis   = self.axis
+		other  = 1 - axis
+		lines  = self.lines
+		signs  = self.signs
+		balls  = self.Balls(bids)
+		pos    = balls[:, :2]
+		vel    = balls[:, 2:]
+		coords = np.zeros((len(bids), len(lines)))
+		times  = np.full((len(bids), len(lines)), np.inf)
+		dt     = AI_PREDICT_STEP * PHYSICS_STEP
+		grav   = 0.02 * dt / self.ballMass
+
+		for step in range(AI_PREDICT_FRAMES // AI_PREDICT_STEP):
+			vel  = vel - pos * (grav / ((pos * pos).sum(axis=1) + 0.1))[:, None]
+			pos2 = pos + vel * dt
+
+			# crossing a paddle line, towards the wall: [ball, paddle]
+			a   = pos[:, axis] - lines
+			b   = pos2[:, axis] - lines
+			hit = (a * signs < 0) & (b * signs >= 0) & np.isinf(times)
+			if hit.any():
+				frac   = np.where(hit, a / np.where(hit, a - b, 1), 0)
+				coord  = pos[:, other] + (pos2[:, other] - pos[:, other]) * frac
+				coords = np.where(hit, coord, coords)
+				times  = np.where(hit, (step + frac) * AI_PREDICT_STEP, times)
+
+				# after its 1st crossing, the ball hits the wall => contact => predicted again
+				if np.isfinite(times).any(axis=1).all(): break
+
+			# wall bounces
+			over = np.abs(pos2) > BALL_LIMIT
+			if over.any():
+				pos2 = np.where(over, np.sign(pos2) * 2 * BALL_LIMIT - pos2, pos2)
+				vel  = np.where(over, -vel * BALL_RESTITUTION, vel)
+
+			pos = pos2
+
+		self.pathCoord[bids] = coords
+		self.pathFrame[bids] = self.tick
+		self.pathTime[bids]  = times
+
+	def RandomDecision(self, values: np.ndarray, ticks: np.ndarray, ids: np.ndarray, timeout: int) -> np.ndarray:
+		"""Random values that stay the same for timeout frames
+		"""
+		expired = ids[self.tick > ticks[ids] + timeout]
+		if len(expired):
+			values[expired] = self.rng.random(len(expired))
+			ticks[expired]  = self.tick
+
+		return values[ids]
@@ -0,0 +1,159 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong bots
+- headless clients: networking + Sync + AI of the client, without pygame
+- load test: N bots spread across processes, play or spectate, then report server + network stats
+"""
+
+import json
+from multiprocessing import Process, Queue
+import os
+from time import sleep, time
+from urllib.request import urlopen
+
+import pyuv
+
+from common import DefaultFloat, DefaultInt, Percentile
+from log import logger
+from pong_peer import PongPeer
+
+BOT_FPS  = 60                       # bots frame rate, like a vsync'ed client
+BOT_PING = 0.25                     # measure the RTT every x sec
+
+
+class PongBot(PongPeer):
+	def __init__(self, **kwargs):
+		super(PongBot, self).__init__(**kwargs)
+		self.nextPing = 0
+
+	def Controls(self):
+		ids = [self.id] if 0 <= self.id <= 3 and self.paddles[self.id].alive else []
+
+		for pid, pad in zip(ids, self.ai.Controls(ids).tolist()):
+			if self.ControlPaddle(self.paddles[pid], pad): self.hasMoved = True
+
+	def Physics(self):
+		self.Controls()
+		super(PongBot, self).Physics()
+
+	def Stats(self) -> dict:
+		return {
+			'desyncs': self.desyncs,
+			'id': self.id,
+			'lost': self.packetsLost,
+			'late': self.packetsLate,
+			'recv': self.packetsRecv,
+			'rtts': self.rtts,
+			'sent': self.packetsSent,
+		}
+
+	def Step(self):
+		now = time()
+		if self.reconnect: self.CheckReconnect()
+		if now > self.nextPing:
+			self.Ping()
+			self.nextPing = now + BOT_PING
+
+		self.PhysicsLoop()
+		self.Sync()
+		self.frame += 1
+
+
+def RunBots(count: int, duration: float, kwargs: dict, queue: Queue):
+	"""One process: count bots sharing the default uv loop
+	"""
+	bots = [PongBot(**kwargs) for _ in range(count)]
+	for bot in bots: bot.Connect()
+
+	loop  = bots[0].loop
+	end   = time() + duration
+	frame = 1 / BOT_FPS
+
+	while time() < end:
+		start = time()
+		loop.run(pyuv.UV_RUN_NOWAIT)
+		for bot in bots: bot.Step()
+		if (left := frame - (time() - start)) > 0: sleep(left)
+
+	queue.put([bot.Stats() for bot in bots])
+
+
+def ServerStatus(host: str, port: int) -> dict:
+	try:
+		with urlopen(f'http://{host}:{port + 80}/status', timeout=2) as response:
+			return json.loads(response.read())
+	except Exception as e:
+		logger.Warning('ServerStatus', error=str(e))
+		return {}
+
+
+def LoadTest(numBot: int, **kwargs) -> dict:
+	"""Run numBot bots for --duration sec, across processes
+	"""
+	duration = DefaultFloat(kwargs.get('duration'), 5.0)
+	host     = str(kwargs.get('host'))
+	port     = DefaultInt(kwargs.get('port'), 9000)
+	numCpu   = max(min(os.cpu_count() or 1, numBot), 1)
+	queue    = Queue()
+	counts   = [numBot // numCpu + (1 if i < numBot % numCpu else 0) for i in range(numCpu)]
+
+	before    = ServerStatus(host, port)
+	processes = [Process(target=RunBots, args=(count, duration, kwargs, queue)) for count in counts if count]
+	for process in processes: process.start()
+
+	stats = []
+	for _ in processes: stats += queue.get()
+	for process in processes: process.join()
+	after = ServerStatus(host, port)
+
+	rtts  = [rtt for stat in stats for rtt in stat['rtts']]
+	recv  = sum(stat['recv'] for stat in stats)
+	lost  = sum(stat['lost'] for stat in stats)
+	drops = sorted(stat['lost'] / max(stat['recv'] + stat['lost'], 1) * 100 for stat in stats)
+	valid = before and after
+
+	return {
+		'bots': numBot,
+		'players': sum(1 for stat in stats if 0 <= stat['id'] <= 3),
+		'spectators': sum(1 for stat in stats if stat['id'] > 3),
+		'duration': duration,
+		'botRecvPerSec': recv / duration,
+		'botSentPerSec': sum(stat['sent'] for stat in stats) / duration,
+		'dropPct': lost / max(recv + lost, 1) * 100,
+		'dropPct50': Percentile(drops, 50),
+		'dropPct95': Percentile(drops, 95),
+		'desyncs': sum(stat['desyncs'] for stat in stats),
+		'latePackets': sum(stat['late'] for stat in stats),
+		'rttMs50': Percentile(rtts, 50) * 1000,
+		'rttMs95': Percentile(rtts, 95) * 1000,
+		'rttMs99': Percentile(rtts, 99) * 1000,
+		'serverCorrections': after.get('corrections', 0) - before.get('corrections', 0) if valid else None,
+		'serverRecvPerSec': (after['packetsRecv'] - before['packetsRecv']) / duration if valid else None,
+		'serverSentPerSec': (after['packetsSent'] - before['packetsSent']) / duration if valid else None,
+		'serverTickMs': after.get('tickMs', {}),
+	}
+
+
+def MainLoadTest(**kwargs):
+	"""Double the number of bots until --loadtest
+	"""
+	maxBot   = DefaultInt(kwargs.get('loadtest'), 16)
+	numBots  = []
+	numBot   = 1
+	while numBot < maxBot:
+		numBots.append(numBot)
+		numBot *= 2
+	numBots.append(maxBot)
+
+	results = []
+	for numBot in numBots:
+		result = LoadTest(numBot, **kwargs)
+		results.append(result)
+		print(json.dumps(result))
+		# let the server drop the previous bots
+		sleep(2)
+
+	return results
@@ -0,0 +1,65 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong capture
+- raw received datagrams, with their UDP header, timestamp and peer address
+- records: header (time, ip, port, size) + datagram
+- replayed offline by benchmark.py --capture, through the receive handlers, without sockets
+"""
+
+import socket
+import struct
+from time import time
+from typing import List, Tuple
+
+CAPTURE_MAGIC = b'BPC1'
+
+
+class CaptureHeader:
+	structFmt  = 'd4sHH'                    # time since the start, ipv4, port, size
+	structSize = struct.calcsize(structFmt)
+
+
+class Capture:
+	"""Append-only datagram log, the file is buffered => cheap enough for live traffic
+	"""
+	def __init__(self, filename: str):
+		self.file  = open(filename, 'wb')
+		self.start = time()
+
+		self.file.write(CAPTURE_MAGIC)
+
+	def Close(self):
+		if self.file:
+			self.file.close()
+			self.file = None
+
+	def Write(self, address: Tuple[str, int], data: bytes):
+		if not self.file: return
+		header = struct.pack(CaptureHeader.structFmt, time() - self.start, socket.inet_aton(address[0]), address[1], len(data))
+		self.file.write(header + data)
+
+
+def ReadCapture(filename: str) -> List[Tuple[float, Tuple[str, int], bytes]]:
+	"""Load a whole capture
+	:return: [(time, address, datagram)]
+	"""
+	with open(filename, 'rb') as file:
+		data = file.read()
+
+	if data[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC: raise ValueError(f'ReadCapture: not a capture: {filename}')
+
+	packets = []
+	offset  = len(CAPTURE_MAGIC)
+	size    = len(data)
+	while offset + CaptureHeader.structSize <= size:
+		now, ip, port, length = struct.unpack_from(CaptureHeader.structFmt, data, offset)
+		offset += CaptureHeader.structSize
+		if offset + length > size: break
+
+		packets.append((now, (socket.inet_ntoa(ip), port), data[offset: offset + length]))
+		offset += length
+
+	return packets
@@ -6,46 +6,55 @@
 Pong client
 """
 
-from math import copysign, pi
+from collections import OrderedDict
+from importlib import import_module
+from math import copysign
 import os
-from random import random
 import signal
-import struct
-from time import time
-from typing import List, Tuple
+import threading
+from time import perf_counter, time
+from typing import List, NamedTuple, Tuple
 
+import numpy as np
 import pygame
 import pyuv
 
-from common import DefaultInt
-from pong_common import Ball, BALL_X2, Paddle, PADDLE_FAR2, PADDLE_HIT, PADDLE_IMPULSE, PADDLE_NEAR2, PADDLE_X2, \
-	PADDLE_Y2, Pong, SUN_RADIUS, TIMEOUT_DISCONNECT, TIMEOUT_PING, UdpHeader, WALL_THICKNESS, ZONE_X2, ZONE_Y2
-from renderer_basic import Renderer, RendererBasic
-from renderer_opengl import RendererOpenGL
+from audio import AudioManager
+from common import DefaultFloat, DefaultInt
+from log import logger
+from pong_capture import Capture
+from pong_common import BALL_X2, Body, BUTTON_CIRCLE, BUTTON_DOWN, BUTTON_LEFT, BUTTON_RIGHT, BUTTON_SQUARE, BUTTON_UP, \
+	PADDLE_X2, PADDLE_Y2, SUN_RADIUS, WALL_THICKNESS, ZONE_X2
+from pong_peer import PongPeer
+from pong_record import Replay
+from profiler import ExportStats, Profiler
 
 
-RENDERERS = {
-	'basic': RendererBasic,
-	'opengl': RendererOpenGL,
+RENDERERS = {                               # name => (module, class), imported when chosen: OpenGL is optional
+	'basic': ('renderer_basic', 'RendererBasic'),
+	'opengl': ('renderer_opengl', 'RendererOpenGL'),
 }
 
-ACTION_BALL_1      = 1
-ACTION_BALL_2      = 2
-ACTION_BALL_3      = 3
-ACTION_BALL_4      = 4
-ACTION_BALL_ADD    = 5
-ACTION_BALL_DELETE = 6
-ACTION_BALL_RESET  = 7
-ACTION_DEBUG_INPUT = 8
-ACTION_EXIT        = 9
-ACTION_GAME_AI     = 10
-ACTION_GAME_NEW1   = 11
-ACTION_GAME_NEW3   = 12
-ACTION_GAME_NEW5   = 13
-ACTION_GAME_NEW7   = 14
-ACTION_MOUSE_GRAB  = 15
-ACTION_PAUSE       = 16
-ACTION_PAUSE_STEP  = 17
+ACTION_BALL_1        = 1
+ACTION_BALL_2        = 2
+ACTION_BALL_3        = 3
+ACTION_BALL_4        = 4
+ACTION_BALL_ADD      = 5
+ACTION_BALL_DELETE   = 6
+ACTION_BALL_RESET    = 7
+ACTION_DEBUG_INPUT   = 8
+ACTION_DEBUG_PROFILE = 18
+ACTION_EXIT          = 9
+ACTION_GAME_AI       = 10
+ACTION_GAME_NEW1     = 11
+ACTION_GAME_NEW3     = 12
+ACTION_GAME_NEW5     = 13
+ACTION_GAME_NEW7     = 14
+ACTION_MOUSE_GRAB    = 15
+ACTION_PAUSE         = 16
+ACTION_PAUSE_STEP    = 17
+ACTION_SEEK_BACK     = 19
+ACTION_SEEK_NEXT     = 20
 
 # ps4 defaults
 AXES_ZERO      = [0, 0, 0, 0, -1, -1]
@@ -58,23 +67,6 @@ AXIS_Y2        = 3
 AXIS_LTRIGGER  = 4
 AXIS_RTRIGGER  = 5
 
-BUTTON_CROSS    = 1 << 0
-BUTTON_CIRCLE   = 1 << 1
-BUTTON_SQUARE   = 1 << 2
-BUTTON_TRIANGLE = 1 << 3
-BUTTON_SELECT   = 1 << 4
-BUTTON_HOME     = 1 << 5
-BUTTON_START    = 1 << 6
-BUTTON_L3       = 1 << 7
-BUTTON_R3       = 1 << 8
-BUTTON_L1       = 1 << 9
-BUTTON_R1       = 1 << 10
-BUTTON_UP       = 1 << 11
-BUTTON_DOWN     = 1 << 12
-BUTTON_LEFT     = 1 << 13
-BUTTON_RIGHT    = 1 << 14
-BUTTON_TOUCH    = 1 << 15
-
 NAME_PADS = {
 	'PS4 Controller': [None, None],
 }
@@ -96,52 +88,92 @@ PADDLE_COLORS = (
 	(0  , 150, 255),
 )
 
+BALL_ARRAY   = np.array(BALL_COLORS, dtype=np.float64)
+PADDLE_ARRAY = np.array(PADDLE_COLORS, dtype=np.float64)
+
+PROFILE_REFRESH   = 0.5                     # overlay refresh, in sec
+RENDER_THREAD_FPS = 240                     # game loop rate when the render thread draws
+SEEK_STEP         = 10                      # replay seek, in sec
+TEXT_CACHE        = 256
+TITLE_REFRESH     = 0.5                     # window title refresh, in sec
+
 PY_PATH    = os.path.dirname(__file__)
 PONG_PATH  = os.path.abspath(PY_PATH + '/..')
 DATA_PATH  = os.path.join(PONG_PATH, 'data')
 SOUND_PATH = os.path.join(PONG_PATH, 'sound')
 
-SOUND_SOURCES = [
+SOUND_SOURCES = (
 	'ball3',
 	'ball2',
 	'ball3',
 	'ball1',
 	'',
-]
+)
 
 # others
 FONT_SIZE     = 0.3
-TIMEOUT_ANGLE = 0.4
-TIMEOUT_MOVE  = 0.6
 
 
-class PongClient(Pong):
+class Frame(NamedTuple):
+	"""Immutable world snapshot, published by the game thread
+	"""
+	balls:    np.ndarray                # [ball, (x, y, angle, alive)]
+	frame:    int
+	hud:      tuple                     # ((x, y, text, color), ...)
+	id:       int
+	paddles:  np.ndarray                # [paddle, (x, y, angle, alive)]
+	sun:      tuple or None             # (x, y, angle)
+	time:     float                     # perf_counter when taken
+	title:    str                       # window caption, set by the thread that presents
+	vertices: np.ndarray                # wall fixture vertices
+	wallDiv:  int
+	walls:    np.ndarray                # wall healths
+
+
+class PongClient(PongPeer):
 	def __init__(self, **kwargs):
+		# the ball pool must hold the recorded balls
+		replay = Replay(kwargs['replay']) if kwargs.get('replay') else None
+		if replay: kwargs['ball_pool'] = max(DefaultInt(kwargs.get('ball_pool'), 0), replay.maxBall)
+
 		super(PongClient, self).__init__(**kwargs)
-		print('PongClient', kwargs)
+		logger.Info('PongClient', **kwargs)
 
 		# options
+		self.capture       = kwargs.get('capture') or ''
+		self.dirty         = DefaultInt(kwargs.get('dirty'), 0)
 		self.fpsLimit      = DefaultInt(kwargs.get('fps'), 0)
 		self.interpolate   = DefaultInt(kwargs.get('interpolate'), 0)
-		self.rendererClass = RENDERERS[kwargs.get('renderer')]
+		self.profile       = kwargs.get('profile') or ''
+		self.rendererClass = LoadRenderer(kwargs.get('renderer') or 'basic')
+		self.renderThread  = DefaultInt(kwargs.get('render_thread'), 0)
 		self.size          = DefaultInt(kwargs.get('size'), 1280)
 		self.size2         = self.size / 2
+		self.speed         = DefaultFloat(kwargs.get('speed'), 1.0)
 
 		self.actions      = {}
+		self.audio        = AudioManager(SOUND_PATH, SOUND_SOURCES)
+		self.arenaBoxes   = []                                     # wall => clip box
+		self.arenaDiv     = -1                                     # wallDiv of the arena layer, -1 to redraw it
+		self.arenaEnds    = None                                   # type: np.ndarray
+		self.arenaStarts  = None                                   # type: np.ndarray
+		self.arenaThick   = 0
+		self.arenaTouch   = []                                     # wall => walls overlapping its box
+		self.arenaWalls   = None                                   # type: np.ndarray, wall healths in the layer
 		self.aiControl    = 0                                      # AI plays for the player
 		self.axes         = AXES_ZERO[:]                           # axes values
-		self.clientTcp    = None                                   # type: pyuv.TCP
 		self.clock        = pygame.time.Clock()
-		self.connected    = False
-		self.debug        = 0                                      # &1: inputs
+		self.debug        = 0                                      # &1: inputs, &2: profiler
 		self.font         = None                                   # type: pygame.font.Font
+		self.frameNext    = None                                   # type: Frame, latest snapshot for the render thread
+		self.frameReady   = threading.Condition()
 		self.font2        = None                                   # type: pygame.font.Font
 		self.fontSize     = 32
 		self.fontSize2    = 48
 		self.gamepad      = 0
 		self.grab         = True
-		self.hasMoved     = False
 		self.hit          = 0
+		self.hud          = []                                     # [(surface, (x, y))], drawn with one blits
 		self.keyActions   = {}
 		self.keyButtons   = {}
 		self.keyFlag      = 0                                      # actions pushed, from keyboard
@@ -155,19 +187,23 @@ class PongClient(Pong):
 		self.padButtons   = list(range(16))                        # button mapping
 		self.padFlag      = 0                                      # actions pushed, from gamepad
 		self.paused       = 0
-		self.pingTime     = time()
-		self.pongTime     = time()
-		self.randAngle    = [0.5, 0.0]                             # decide to rotate
-		self.randMove     = [0.5, 0.0]                             # decide edge or center
+		self.profileLines = []                                     # overlay text, refreshed every PROFILE_REFRESH
+		self.profileTime  = 0.0
+		self.profiler     = Profiler()                             # game thread stages
 		self.renderer     = None                                   # type: Renderer
-		self.running      = True
+		self.renderFps    = 0.0
+		self.renderStats  = Profiler()                             # render thread stages
+		self.replay       = replay                                 # type: Replay, plays instead of connecting
+		self.replayTime   = 0.0                                    # position in the replay, in sec
 		self.scale        = self.size2 / 6
 		self.screen       = None                                   # type: pygame.Surface
-		self.sounds       = [None] * len(SOUND_SOURCES)
-		self.volume       = 1.0
-
-		self.loop     = pyuv.Loop.default_loop()
-		self.signal_h = pyuv.Signal(self.loop)
+		self.snapDiv      = -1
+		self.snapVertices = None                                   # type: np.ndarray
+		self.textCache    = OrderedDict()                          # (text, color, font) => surface
+		self.textHits     = 0
+		self.textMisses   = 0
+		self.title        = ''
+		self.titleTime    = 0.0
 
 	# HELPERS
 	#########
@@ -178,175 +214,23 @@ class PongClient(Pong):
 		pygame.event.set_grab(grab)
 		self.grab = grab
 
-	def UpdateTitle(self):
-		status = 'CONN' if self.connected else 'DISC'
-		pygame.display.set_caption(f'BattlePong [{status}] div={self.numDiv} ai={self.aiControl} id={self.id} key={self.lastKey} fps={self.clock.get_fps():.1f}')
-
-	# NETWORK
-	#########
-
-	def CheckReconnect(self):
-		mustPing = 0
-		now      = time()
-		if now > self.pongTime + TIMEOUT_DISCONNECT:
-			mustPing = 2
-		elif now > self.pongTime + TIMEOUT_PING:
-			mustPing = 1
-
-		if mustPing and now > self.pingTime + TIMEOUT_PING:
-			if mustPing == 2:
-				print('CheckReconnect: disconnected')
-				self.connected = False
-				self.Send(self.address, struct.pack('Bb', ord('I'), self.id))
-			else:
-				self.Send(self.address, b'p')
-			self.pingTime = now
-
-	def Signal(self, handle: pyuv.Signal, signum: int):
-		self.signal_h.close()
-
-		if self.clientTcp:
-			self.clientTcp.close()
-			self.clientTcp = None
-
-		if self.udpHandle:
-			self.udpHandle.close()
-			self.udpHandle = None
-
-		self.running = False
-
-	def UdpClientRead(self, handle: pyuv.UDP, address: Tuple[str, int], flags: int, data: bytes, error: int):
-		if data is None: return
-
-		seq   = self.udpHeader.Parse(data[:UdpHeader.structSize])
-		delta = seq - self.seqRecv
-		# 100 => 65000
-		if delta > 32768 or -32768 < delta < 0:
-			print('seq is older', seq, '<', self.seqRecv)
-		else:
-			self.seqRcv = seq
-
-		data           = data[UdpHeader.structSize:]
-		now            = time()
-		self.connected = True
-		self.pongTime  = now
+	def UpdateTitle(self, force: bool = True):
+		"""set_caption is slow on some platforms => only every TITLE_REFRESH, and only if the text changed
+		"""
+		now = perf_counter()
+		if not force and now < self.titleTime + TITLE_REFRESH: return
+		self.titleTime = now
 
-		# 1) game
-		# ball
-		if data[0] == ord('B'):
-			bid = data[1]
-			while bid >= len(self.balls): self.AddBall()
-
-			self.balls[bid].Parse(data[:Ball.structSize])
-			self.doneFrame = 0
-			self.start     = now
-
-		# paddle
-		elif data[0] == ord('P'):
-			pid = data[1]
-			if 0 <= pid < len(self.paddles): self.paddles[pid].Parse(data[:Paddle.structSize])
-			data = data[Paddle.structSize:]
-
-		# wall
-		elif data[0] == ord('W'):
-			wid    = data[1]
-			health = data[2]
-			if wid < len(self.walls):
-				self.walls[wid] = health
-				self.CalculateHealth(wid // self.numDiv, False)
-
-			data = data[4:]
-
-		# 2) connection
-		elif data[0] == ord('p'): self.Send(self.address, b'q')
-		elif data[0] == ord('q'): print('pong!', now)
-
-		elif data[0] == ord('I'):
-			self.id = data[1]
-			data    = data[2:]
-			self.UpdateTitle()
-		else:
-			print('TcpServer:', data)
+		status = 'CONN' if self.connected else 'DISC'
+		title  = f'BattlePong [{status}] div={self.numDiv} ai={self.aiControl} id={self.id} key={self.lastKey} fps={(self.renderFps if self.renderThread else self.clock.get_fps()):.1f}'
+		if title != self.title:
+			self.title = title
+			# render thread: set in RenderLoop, next to Present => the SDL video calls stay on one thread
+			if not self.renderThread: pygame.display.set_caption(title)
 
 	# GAME
 	######
 
-	def AiControls(self, id: int) -> Tuple[List[float], int]:
-		paddle = self.paddles[id]
-		if not paddle.alive: return AXES_ZERO, 0
-
-		# 1) find closest ball
-		horiz   = 1 if paddle.angle0 > 0 else 0
-		pbody   = paddle.body
-		ppos    = pbody.position
-		best    = self.balls[0]
-		bestDot = 1000
-
-		if len(self.balls) > 0:
-			best = None
-
-			for ball in self.balls:
-				bbody   = ball.body
-				bpos    = bbody.position
-				bvel    = bbody.linearVelocity
-				ballDot = 1000
-
-				# ball is coming towards us?
-				dx0  = bpos[0] - paddle.position0[0]
-				dy0  = bpos[1] - paddle.position0[1]
-				# dots = []
-				for i in range(5):
-					dx1     = dx0 if horiz == 0 else dx0 - (i - 2) * ZONE_X2
-					dy1     = dy0 if horiz == 1 else dy0 - (i - 2) * ZONE_Y2
-					dist2   = dx1 * dx1 + dy1 * dy1 + 0.1
-					dot     = (dx1 * bvel[0] + dy1 * bvel[1]) / dist2
-					ballDot = min(ballDot, dot)
-					# dots.append(int(dot * 100) / 100)
-
-				if ballDot < 0 and ballDot < bestDot:
-					best    = ball
-					bestDot = ballDot
-				# print(f'bid={ball.id} bdot={ballDot:.2f} best={bestDot:.2f} {best.id if best else "X"}', dots)
-
-		# 2) move
-		bpos    = best.body.position if best else paddle.position0
-		dx      = bpos[0] - ppos[0]
-		dy      = bpos[1] - ppos[1]
-		dist2   = dx * dx + dy * dy
-		buttons = 0
-
-		randMove = self.RandomDecision(self.randMove, TIMEOUT_MOVE) - 0.5
-
-		if paddle.angle0 > 0:
-			# ball behind => give it some space
-			if dist2 < PADDLE_FAR2:
-				if paddle.position0[1] < 0:
-					if dy < 0: dx = -dx
-				elif dy > 0: dx = -dx
-
-			dx += randMove * PADDLE_Y2
-
-			if dx > 0:   buttons |= BUTTON_RIGHT
-			elif dx < 0: buttons |= BUTTON_LEFT
-		else:
-			# ball behind => give it some space
-			if dist2 < PADDLE_FAR2:
-				if paddle.position0[0] < 0:
-					if dx < 0: dy = -dy
-				elif dx > 0: dy = -dy
-
-			dy += randMove * PADDLE_Y2
-
-			if dy > 0:   buttons |= BUTTON_UP
-			elif dy < 0: buttons |= BUTTON_DOWN
-
-		# 3) rotate hit?
-		if dist2 < PADDLE_NEAR2:
-			randAngle = self.RandomDecision(self.randAngle, TIMEOUT_ANGLE)
-			buttons |= (BUTTON_L1 if randAngle > 0.5 else BUTTON_R1)
-
-		return AXES_ZERO, buttons
-
 	def Controls(self):
 		self.GamePadUpdate()
 
@@ -361,158 +245,155 @@ class PongClient(Pong):
 		else:
 			ids = [0, 1, 2, 3]
 
+		# 2) AI inputs, all paddles at once
+		mine   = max(0, self.id)
+		aiIds  = [id for id in ids if self.paddles[id].alive and (id != mine or self.aiControl)]
+		aiPads = dict(zip(aiIds, self.ai.Controls(aiIds).tolist()))
+
 		for id in ids:
 			paddle = self.paddles[id]
 			if not paddle.alive: continue
 
-			# 2) gamepad + keyboard + AI inputs
-			if id != max(0, self.id):
-				axes, pad = self.AiControls(id)
+			# 3) gamepad + keyboard + AI inputs
+			if id != mine:
+				axes = AXES_ZERO
+				pad  = aiPads.get(id, 0)
 			else:
 				axes = self.axes
-				pad  = self.padFlag | self.keyFlag
-				if self.aiControl: pad |= self.AiControls(id)[1]
+				pad  = self.padFlag | self.keyFlag | aiPads.get(id, 0)
 
+			# 4) apply inputs
 			axisX = axes[AXIS_X1] + axes[AXIS_X2]
 			axisY = axes[AXIS_Y1] + axes[AXIS_Y2]
+			if self.ControlPaddle(paddle, pad, axisX, axisY, axes[AXIS_LTRIGGER], axes[AXIS_RTRIGGER]): self.hasMoved = True
 
-			if pad & BUTTON_DOWN:  axisY += 1
-			if pad & BUTTON_LEFT:  axisX -= 1
-			if pad & BUTTON_RIGHT: axisX += 1
-			if pad & BUTTON_UP:    axisY -= 1
-
-			axisX = min(max(axisX, -1), 1)
-			axisY = min(max(axisY, -1), 1)
-
-			# 3) apply inputs
-			horiz  = paddle.angle0 > 0
-			body   = paddle.body
-			center = body.worldCenter
-
-			# hitting the ball
-			if (pad & (BUTTON_SQUARE | BUTTON_L1)) or axes[AXIS_LTRIGGER] > -1:
-				self.hasMoved = True
-				value = (1 if (pad & (BUTTON_SQUARE | BUTTON_L1)) else (axes[AXIS_LTRIGGER] + 1) / 2) * PADDLE_HIT
-				if horiz:
-					if paddle.position0[1] < 0:
-						if body.angle < pi / 2 + pi / 16: body.ApplyAngularImpulse(value, True)
-					elif body.angle > pi / 2 - pi / 16: body.ApplyAngularImpulse(-value, True)
-				elif body.angle < pi / 16: body.ApplyAngularImpulse(value, True)
-
-			if (pad & (BUTTON_CIRCLE | BUTTON_R1)) or axes[AXIS_RTRIGGER] > -1:
-				self.hasMoved = True
-				value = (1 if (pad & (BUTTON_CIRCLE | BUTTON_R1)) else (axes[AXIS_RTRIGGER] + 1) / 2) * PADDLE_HIT
-				if horiz:
-					if paddle.position0[1] < 0:
-						if body.angle > pi / 2 - pi / 16: body.ApplyAngularImpulse(-value, True)
-					elif body.angle < pi / 2 + pi / 16: body.ApplyAngularImpulse(value, True)
-				elif body.angle > -pi / 16: body.ApplyAngularImpulse(-value, True)
-
-			# movement
-			if axisX and horiz:
-				self.hasMoved = True
-				body.ApplyLinearImpulse((PADDLE_IMPULSE * axisX, 0), center, True)
-			if axisY and not horiz:
-				self.hasMoved = True
-				body.ApplyLinearImpulse((0, -PADDLE_IMPULSE * axisY), center, True)
-
-			paddle.buttons = pad
-
-	def Draw(self):
-		self.screen.fill((40, 40, 40))
+	def Draw(self, frame: Frame):
+		"""Draw a snapshot, only reads from frame, so it can run in the render thread
+		"""
+		self.DrawArena(frame)
+		self.renderer.DrawLayer()
 
 		scale = self.scale
-		size2 = self.size2
-
-		# walls
-		vertices  = self.wall.fixtures[0].shape.vertices
-		numVertex = len(vertices)
-
-		for i in range(numVertex - (numVertex & 1)):
-			x, y   = vertices[i]
-			x2, y2 = vertices[(i + 1) % numVertex]
-			# if not self.frame: print(i, numVertex, (x, y), (x2, y2))
-			health = self.walls[i] / 255
-			thick  = max(int(WALL_THICKNESS * scale), 2)
-			thick2 = max(int(thick / 4 + 0.5), 2)
-
-			self.renderer.DrawLine(
-				x * scale + size2 + (-thick2 if x == ZONE_X2 else 0),
-				-y * scale + size2 + (-thick2 if -y == ZONE_X2 else 0),
-				x2 * scale + size2 + (-thick2 if x2 == ZONE_X2 else 0),
-				-y2 * scale + size2 + (-thick2 if -y2 == ZONE_X2 else 0),
-				(240 - 40 * health, 50 + 150 * health, 0 + 240 * health) if health > 0 else (40, 40, 40),
-				thick
-			)
-
-		# sun
-		if self.sun:
-			x = self.sun.position[0] * scale + size2
-			y = self.sun.position[1] * scale + size2
-			self.renderer.DrawCircle(x, y, SUN_RADIUS * scale, self.sun.angle, (220, 110, 40), False)
 
-		# show pad/mouse inputs
-		if self.debug & 1:
-			gap   = self.fontSize * 1.25
-			size4 = size2 / 2
+		# texts
+		for x, y, text, color in frame.hud: self.DrawText(x, y, text, color)
 
-			for i, axis in enumerate(self.axes):
-				self.DrawText(size4, size4 + i * gap, f'{i}: {axis:.3f}', (128, 128, 128))
-			for i in range(16):
-				self.DrawText(size4 * 3, size4 + i * gap, f'{i}: {self.padFlag & (1 << i)}', (128, 128, 128))
-			self.DrawText(size4, size4 + 7 * gap, f'{self.mouseAbs[0]:.0f} {self.mouseAbs[1]:.0f}', (128, 128, 128))
+		# paddles
+		states = frame.paddles
+		colors = PADDLE_ARRAY.copy()
+		if 0 <= frame.id < len(colors): colors[frame.id] = (0, 255, 255)
+		dead         = states[:, 3] == 0
+		colors[dead] = colors[dead] * 0.1 + 80
+		self.renderer.DrawQuads(self.renderer.ToScreen(states[:, :2]), (PADDLE_X2 * scale, PADDLE_Y2 * scale), states[:, 2], colors)
 
-			for pid, paddle in enumerate(self.paddles):
-				self.DrawText(size4, size4 + (9 + pid) * gap, f'{paddle.buttons}', (128, 128, 128))
+		# balls
+		states = frame.balls
+		alive  = np.flatnonzero(states[:, 3])
+		self.renderer.DrawCircles(
+			self.renderer.ToScreen(states[alive, :2]),
+			BALL_X2 * scale,
+			states[alive, 2],
+			BALL_ARRAY[alive % len(BALL_ARRAY)],
+			True)
+
+		self.renderer.DrawSurfaces(self.hud)
+		self.hud.clear()
+
+	def DrawArena(self, frame: Frame):
+		"""Background, walls and sun go to the renderer's layer, only damaged walls are redrawn
+		"""
+		walls = frame.walls
+
+		if frame.wallDiv != self.arenaDiv:
+			self.DrawArenaFull(frame)
+			return
 
-		# paddles
-		for pid, paddle in enumerate(self.paddles):
-			self.DrawText(paddle.position0[0] * 1.08 * scale + size2, -paddle.position0[1] * 1.08 * scale + size2, f'{paddle.health}')
+		numWall = len(self.arenaStarts)
+		ids     = np.flatnonzero(walls[:numWall] != self.arenaWalls[:numWall])
+		if not ids.size: return
 
-			color = PADDLE_COLORS[pid] if self.id == -1 or self.id != pid else (0, 255, 255)
-			if not paddle.alive: color = (80 + color[0] * 0.1, 80 + color[1] * 0.1, 80 + color[2] * 0.1)
+		self.arenaWalls = walls
+		colors          = WallColors(walls[:numWall])
+		self.renderer.BeginLayer()
 
-			x = paddle.position[0] * scale + size2
-			y = -paddle.position[1] * scale + size2
-			self.renderer.DrawQuad(x, y, PADDLE_X2 * scale, PADDLE_Y2 * scale, paddle.angle, color)
+		# redraw, in order, every segment overlapping the damaged one, clipped to its box
+		for wid in ids.tolist():
+			touch = self.arenaTouch[wid]
+			self.renderer.SetClip(self.arenaBoxes[wid])
+			self.renderer.DrawLines(self.arenaStarts[touch], self.arenaEnds[touch], colors[touch], self.arenaThick)
 
-		# balls
-		numColor = len(BALL_COLORS)
-		for bid, ball in enumerate(self.balls):
-			if not ball.alive: continue
+		self.renderer.SetClip(None)
+		self.renderer.EndLayer()
 
-			color = BALL_COLORS[bid % numColor]
-			x     = ball.position[0] * scale + size2
-			y     = -ball.position[1] * scale + size2
-			self.renderer.DrawCircle(x, y, BALL_X2 * scale, ball.angle, color, True)
+	def DrawArenaFull(self, frame: Frame):
+		scale     = self.scale
+		vertices  = frame.vertices
+		walls     = frame.walls
+		numVertex = len(vertices)
+		numWall   = numVertex - (numVertex & 1)
+		thick     = max(int(WALL_THICKNESS * scale), 2)
+		thick2    = max(int(thick / 4 + 0.5), 2)
+
+		# segments touching the right/bottom edges are pulled inside the screen
+		points = self.renderer.ToScreen(vertices) - thick2 * ((vertices * (1, -1)) == ZONE_X2)
+		starts = points[:numWall]
+		ends   = np.roll(points, -1, axis=0)[:numWall]
+
+		# segment boxes, with a margin for the line width
+		mins  = np.floor(np.minimum(starts, ends) - thick)
+		maxs  = np.ceil(np.maximum(starts, ends) + thick)
+		boxes = np.column_stack((mins, maxs - mins)).astype(np.int64)
+		touch = np.all((mins[:, None] < maxs[None, :]) & (mins[None, :] < maxs[:, None]), axis=2)
+
+		self.arenaBoxes  = [tuple(box) for box in boxes.tolist()]
+		self.arenaDiv    = frame.wallDiv
+		self.arenaEnds   = ends
+		self.arenaStarts = starts
+		self.arenaThick  = thick
+		self.arenaTouch  = [np.flatnonzero(row) for row in touch]
+		self.arenaWalls  = walls
+
+		self.renderer.BeginLayer()
+		self.renderer.Clear((40, 40, 40))
+		self.renderer.DrawLines(starts, ends, WallColors(walls[:numWall]), thick)
+
+		if frame.sun:
+			x = frame.sun[0] * scale + self.size2
+			y = frame.sun[1] * scale + self.size2
+			self.renderer.DrawCircle(x, y, SUN_RADIUS * scale, frame.sun[2], (220, 110, 40), False)
+
+		self.renderer.EndLayer()
 
 	def DrawText(self, x: int, y: int, text: str, color: Tuple[int, int, int] = (200, 200, 200)):
-		textObj         = self.font.render(text, True, color)
-		textRect        = textObj.get_rect()
-		textRect.center = (x, y)
-		self.screen.blit(textObj, textRect)
+		"""Queue a centered text, the HUD is drawn at the end of Draw
+		"""
+		textObj = self.RenderText(text, color, self.font)
+		self.hud.append((textObj, (x - textObj.get_width() // 2, y - textObj.get_height() // 2)))
 
 	def GameKeyDown(self, key: int):
 		action = self.keyActions.get(key)
 
-		if action == ACTION_EXIT:          self.running = False
-		elif action == ACTION_BALL_1:      self.SetBalls(1)
-		elif action == ACTION_BALL_2:      self.SetBalls(2)
-		elif action == ACTION_BALL_3:      self.SetBalls(3)
-		elif action == ACTION_BALL_4:      self.SetBalls(4)
-		elif action == ACTION_BALL_ADD:    self.AddBall()
-		elif action == ACTION_BALL_DELETE: self.DeleteBall()
-		elif action == ACTION_BALL_RESET:  self.ResetBalls()
-		elif action == ACTION_DEBUG_INPUT: self.debug ^= 1
-		elif action == ACTION_GAME_AI:     self.aiControl ^= 1
-		elif action == ACTION_GAME_NEW1:   self.NewGame(1)
-		elif action == ACTION_GAME_NEW3:   self.NewGame(3)
-		elif action == ACTION_GAME_NEW5:   self.NewGame(5)
-		elif action == ACTION_GAME_NEW7:   self.NewGame(7)
-		elif action == ACTION_MOUSE_GRAB:  self.Grab(False)
-		elif action == ACTION_PAUSE:       self.Pause(2)
-		elif action == ACTION_PAUSE_STEP:  self.Pause(2, 1)
-		else:                              self.lastKey = key
+		if action == ACTION_EXIT:            self.running = False
+		elif action == ACTION_BALL_1:        self.SetBalls(1)
+		elif action == ACTION_BALL_2:        self.SetBalls(2)
+		elif action == ACTION_BALL_3:        self.SetBalls(3)
+		elif action == ACTION_BALL_4:        self.SetBalls(4)
+		elif action == ACTION_BALL_ADD:      self.AddBall()
+		elif action == ACTION_BALL_DELETE:   self.DeleteBall()
+		elif action == ACTION_BALL_RESET:    self.ResetBalls()
+		elif action == ACTION_DEBUG_INPUT:   self.debug ^= 1
+		elif action == ACTION_DEBUG_PROFILE: self.debug ^= 2
+		elif action == ACTION_GAME_AI:       self.aiControl ^= 1
+		elif action == ACTION_GAME_NEW1:     self.NewGame(1)
+		elif action == ACTION_GAME_NEW3:     self.NewGame(3)
+		elif action == ACTION_GAME_NEW5:     self.NewGame(5)
+		elif action == ACTION_GAME_NEW7:     self.NewGame(7)
+		elif action == ACTION_MOUSE_GRAB:    self.Grab(False)
+		elif action == ACTION_PAUSE:         self.Pause(2)
+		elif action == ACTION_PAUSE_STEP:    self.Pause(2, 1)
+		elif action == ACTION_SEEK_BACK:     self.Seek(-SEEK_STEP)
+		elif action == ACTION_SEEK_NEXT:     self.Seek(SEEK_STEP)
+		else:                                self.lastKey = key
 
 		self.keys[key] = self.frame
 		self.keyFlag |= self.keyButtons.get(key, 0)
@@ -567,7 +448,7 @@ class PongClient(Pong):
 
 	def NewGame(self, numDiv: int = 0):
 		super(PongClient, self).NewGame(numDiv)
-		self.PlaySound(0)
+		self.audio.Play([0])
 
 	def OpenMapping(self):
 		self.keyActions = {
@@ -575,6 +456,7 @@ class PongClient(Pong):
 			pygame.K_2:            ACTION_BALL_2,
 			pygame.K_3:            ACTION_BALL_3,
 			pygame.K_4:            ACTION_BALL_4,
+			pygame.K_BACKQUOTE:    ACTION_DEBUG_PROFILE,
 			pygame.K_BACKSPACE:    ACTION_BALL_RESET,
 			pygame.K_ESCAPE:       ACTION_EXIT,
 			pygame.K_F1:           ACTION_GAME_NEW7,
@@ -586,6 +468,8 @@ class PongClient(Pong):
 			pygame.K_LEFTBRACKET:  ACTION_BALL_DELETE,
 			pygame.K_o:            ACTION_PAUSE_STEP,
 			pygame.K_p:            ACTION_PAUSE,
+			pygame.K_PAGEDOWN:     ACTION_SEEK_NEXT,
+			pygame.K_PAGEUP:       ACTION_SEEK_BACK,
 			pygame.K_RETURN:       ACTION_GAME_AI,
 			pygame.K_RIGHTBRACKET: ACTION_BALL_ADD,
 			pygame.K_SPACE:        ACTION_DEBUG_INPUT,
@@ -626,78 +510,170 @@ class PongClient(Pong):
 		self.Controls()
 		super(PongClient, self).Physics()
 
-	def PlaySound(self, sid: int):
-		if sid >= len(self.sounds): return
-		if not (source := SOUND_SOURCES[sid]): return
-
-		if not (sound := self.sounds[sid]):
-			baseName = os.path.join(SOUND_PATH, source)
-			for ext in ('.ogg', '.mp3', '.wav'):
-				filename = baseName + ext
-				if os.path.exists(filename):
-					try:
-						sound = pygame.mixer.Sound(filename)
-						self.sounds[sid] = sound
-						break
-					except:
-						print('Cannot open sound', filename)
-
-		if sound:
-			sound.set_volume(self.volume)
-			sound.play()
-		else:
-			SOUND_SOURCES[sid] = None
-
 	def PlaySounds(self):
-		for i in range(5):
-			if self.hitFlag & (1 << i): self.PlaySound(i)
-
-	def RandomDecision(self, randTime: List[float], timeout: float) -> float:
-		now = time()
-		if now > randTime[1] + timeout:
-			randTime[0] = random()
-			randTime[1] = now
-
-		return randTime[0]
-
-	def Sync(self):
-		if self.id < 0 or self.id > 3: return
+		"""hitFlag => one sound per event kind, the same kinds from several balls are merged
+		"""
+		if hitFlag := self.hitFlag:
+			self.audio.Play([i for i in range(len(SOUND_SOURCES)) if hitFlag & (1 << i)])
+
+	def RenderText(self, text: str, color: Tuple[int, int, int], font: pygame.font.Font) -> pygame.Surface:
+		"""Rendered text from the LRU cache, most labels don't change between frames
+		"""
+		key = (text, color, font)
+		if textObj := self.textCache.get(key):
+			self.textCache.move_to_end(key)
+			self.textHits += 1
+			return textObj
+
+		self.textMisses += 1
+		if len(self.textCache) >= TEXT_CACHE: self.textCache.popitem(last=False)
+
+		textObj             = font.render(text, True, color)
+		self.textCache[key] = textObj
+		return textObj
+
+	def Seek(self, delta: float):
+		"""Replay: jump from the closest keyframe
+		"""
+		if not self.replay: return
+		self.replayTime = min(max(self.replayTime + delta, 0), self.replay.duration)
+		self.replay.Seek(self, self.replayTime)
+
+	def Snapshot(self) -> Frame:
+		"""Immutable copy of what Draw needs, built by the game thread
+		"""
+		scale = self.scale
+		size2 = self.size2
+		hud   = []
 
-		if self.hasMoved or (self.dirtyPaddle & (1 << self.id)):
-			paddle = self.paddles[self.id]
-			self.Send(self.address, paddle.Format())
+		# show pad/mouse inputs
+		if self.debug & 1:
+			gap   = self.fontSize * 1.25
+			size4 = size2 / 2
+			grey  = (128, 128, 128)
 
-		if self.dirtyBall:
-			for ball in self.balls:
-				if ball.parentId == self.id and (ball.flag & (1 << self.id)):
-					self.Send(self.address, ball.Format())
+			for i, axis in enumerate(self.axes):
+				hud.append((size4, size4 + i * gap, f'{i}: {axis:.3f}', grey))
+			for i in range(16):
+				hud.append((size4 * 3, size4 + i * gap, f'{i}: {self.padFlag & (1 << i)}', grey))
+			hud.append((size4, size4 + 7 * gap, f'{self.mouseAbs[0]:.0f} {self.mouseAbs[1]:.0f}', grey))
 
-		self.hasMoved = False
+			for pid, paddle in enumerate(self.paddles):
+				hud.append((size4, size4 + (9 + pid) * gap, f'{paddle.buttons}', grey))
+
+		# stage timings: p50 p95 max, in ms
+		if self.debug & 2:
+			now = perf_counter()
+			if now > self.profileTime + PROFILE_REFRESH:
+				self.profileLines = self.profiler.Lines() + [f'render.{line}' for line in self.renderStats.Lines()]
+				self.profileTime  = now
+
+			gap = self.fontSize * 1.25
+			for i, line in enumerate(self.profileLines):
+				hud.append((size2, gap * (i + 1), line, (128, 255, 128)))
+
+		# paddle healths
+		for paddle in self.paddles:
+			hud.append((paddle.position0[0] * 1.08 * scale + size2, -paddle.position0[1] * 1.08 * scale + size2, f'{paddle.health}', (200, 200, 200)))
+
+		# the wall fixture only changes with the layout
+		if self.wallDiv != self.snapDiv:
+			self.snapDiv      = self.wallDiv
+			self.snapVertices = ReadOnly(np.array(self.wall.fixtures[0].shape.vertices))
+
+		return Frame(
+			balls    = ReadOnly(States(self.balls)),
+			frame    = self.frame,
+			hud      = tuple(hud),
+			id       = self.id,
+			paddles  = ReadOnly(States(self.paddles)),
+			sun      = (self.sun.position[0], self.sun.position[1], self.sun.angle) if self.sun else None,
+			time     = perf_counter(),
+			title    = self.title,
+			vertices = self.snapVertices,
+			wallDiv  = self.wallDiv,
+			walls    = ReadOnly(np.array(self.walls)),
+		)
 
 	# MAIN LOOP
 	###########
 
+	def PrintTimers(self):
+		"""Stage times, in ms, + export to the --profile file
+		"""
+		print(f'game: fps={self.clock.get_fps():.1f}')
+		stats = {'game': self.profiler.Stats(), 'render': self.renderStats.Stats()}
+		for section, stages in stats.items():
+			for name, stat in stages.items():
+				print(f'{section}.{name}: p50={stat["p50"]:.2f} p95={stat["p95"]:.2f} max={stat["max"]:.2f} frames={stat["frames"]}')
+
+		if self.profile: ExportStats(self.profile, stats)
+
+	def Publish(self, frame: Frame or None):
+		"""Swap in the latest snapshot, the render thread skips the older ones
+		"""
+		with self.frameReady:
+			self.frameNext = frame
+			self.frameReady.notify()
+
+	def Render(self, frame: Frame, profiler: Profiler):
+		"""Draw + Flush, the caller presents
+		"""
+		self.Draw(frame)
+		self.renderer.Flush()
+		profiler.Lap('draw')
+
+	def RenderLoop(self):
+		"""Render thread: draw + present the latest snapshot, at its own pace
+		"""
+		caption = ''
+		clock   = pygame.time.Clock()
+		drawn   = None
+
+		while True:
+			with self.frameReady:
+				while self.running and self.frameNext is drawn: self.frameReady.wait()
+				frame = self.frameNext
+			if not self.running: break
+
+			stats = self.renderStats
+			stats.Start()
+			self.Render(frame, stats)
+			self.renderer.Present()
+			stats.Lap('flip')
+			if frame.title != caption:
+				caption = frame.title
+				pygame.display.set_caption(caption)
+			stats.End()
+			drawn = frame
+			clock.tick(self.fpsLimit)
+			self.renderFps = clock.get_fps()
+
 	def Run(self):
 		pygame.init()
 		pygame.mixer.init()
+		self.audio.Start()
 
 		self.fontSize  = (int(FONT_SIZE * self.scale) // 8) * 8
 		self.fontSize2 = (int(FONT_SIZE * self.scale * 1.5) // 8) * 8
 		self.font      = pygame.font.Font(os.path.join(DATA_PATH, 'kenpixel.ttf'), self.fontSize)
 		self.font2     = pygame.font.Font(os.path.join(DATA_PATH, 'kenpixel.ttf'), self.fontSize2)
-		self.renderer  = self.rendererClass()
+		self.renderer  = self.rendererClass(dirty=self.dirty)
 
-		flags = pygame.DOUBLEBUF
-		if self.renderer.name == 'opengl': flags |= pygame.OPENGL
+		# the GL context belongs to the main thread
+		if self.renderThread and self.renderer.name == 'opengl':
+			print('Run: the render thread needs the basic renderer')
+			self.renderThread = 0
 
-		self.screen          = pygame.display.set_mode((self.size, self.size), flags=flags)
-		self.renderer.screen = self.screen
+		flags = pygame.DOUBLEBUF | self.renderer.flags
 
-		self.udpHandle = pyuv.UDP(self.loop)
-		self.udpHandle.bind(('127.0.0.1', 0))
-		self.udpHandle.start_recv(self.UdpClientRead)
-		self.Send(self.address, struct.pack('Bb', ord('I'), self.id))
+		self.screen = pygame.display.set_mode((self.size, self.size), flags=flags)
+		self.renderer.Init(self.screen)
+		self.renderer.SetView(self.scale, self.size2)
+		self.arenaDiv = -1
 
+		if self.capture: self.capturer = Capture(self.capture)
+		if not self.replay: self.Connect()
 		self.signal_h.start(self.Signal, signal.SIGINT)
 
 		self.GamePadInit()
@@ -707,12 +683,21 @@ class PongClient(Pong):
 		self.NewGame()
 		# self.AddBall(2)
 
+		if self.renderThread:
+			thread = threading.Thread(target=self.RenderLoop, name='render', daemon=True)
+			thread.start()
+
+		profiler = self.profiler
+		lastTime = perf_counter()
 		while self.running:
+			profiler.Start()
+
 			# 0) reconnect
-			if self.reconnect: self.CheckReconnect()
+			if self.reconnect and not self.replay: self.CheckReconnect()
 
 			# 1) uv_loop
 			self.loop.run(pyuv.UV_RUN_NOWAIT)
+			profiler.Lap('uv')
 
 			# 2) SDL events
 			events = pygame.event.get()
@@ -737,24 +722,88 @@ class PongClient(Pong):
 						self.mousePos[0] = event.pos[0]
 						self.mousePos[1] = event.pos[1]
 
+			profiler.Lap('events')
+
 			# 3) step
+			now      = perf_counter()
+			elapsed  = now - lastTime
+			lastTime = now
+
 			if self.paused == 0:
-				self.PhysicsLoop(self.interpolate)
+				if self.replay:
+					self.replayTime += elapsed * self.speed
+					if not self.replay.Advance(self, self.replayTime): self.paused = 1
+				else:
+					self.PhysicsLoop(self.interpolate)
 				self.PlaySounds()
 
 				if self.nextPause and self.doneFrame > 0:
 					self.paused    = 1
 					self.nextPause = 0
 
-			self.Draw()
+			profiler.Lap('physics')
+
+			# 4) draw + send: the render thread draws the latest snapshot on its own
+			frame = self.Snapshot()
+			profiler.Lap('snapshot')
+			if self.renderThread:
+				self.Publish(frame)
+			else:
+				self.Render(frame, profiler)
+
 			self.Sync()
-			self.UpdateTitle()
+			profiler.Lap('sync')
+			profiler.End('input')
+			self.UpdateTitle(False)
+			profiler.Lap('title')
 
-			pygame.display.flip()
+			if not self.renderThread:
+				self.renderer.Present()
+				profiler.Lap('flip')
 
-			self.clock.tick(self.fpsLimit)
+			profiler.End()
+			self.clock.tick(max(self.fpsLimit, RENDER_THREAD_FPS) if self.renderThread else self.fpsLimit)
 			self.frame += 1
 
+		if self.renderThread:
+			self.Publish(None)
+			thread.join()
+
+		self.PrintTimers()
+		if self.capturer: self.capturer.Close()
+
+
+def LoadRenderer(name: str) -> type:
+	"""Import a renderer when it is chosen, PyOpenGL is only needed for 'opengl'
+	"""
+	module, className = RENDERERS[name]
+	return getattr(import_module(module), className)
+
+
+def ReadOnly(array: np.ndarray) -> np.ndarray:
+	array.flags.writeable = False
+	return array
+
+
+def States(objects: List[Body]) -> np.ndarray:
+	"""Interpolated states: [object, (x, y, angle, alive)]
+	"""
+	values = []
+	for obj in objects:
+		pos     = obj.position
+		values += (pos[0], pos[1], obj.angle, obj.alive)
+
+	return np.array(values, dtype=np.float64).reshape(-1, 4)
+
+
+def WallColors(walls: np.ndarray) -> np.ndarray:
+	"""Wall healths => colors, dead walls blend with the background
+	"""
+	health              = walls / 255
+	colors              = np.column_stack((240 - 40 * health, 50 + 150 * health, 240 * health))
+	colors[health <= 0] = (40, 40, 40)
+	return colors
+
 
 def MainClient(**kwargs):
 	print(f'Client: pyuv={pyuv.__version__}')
@@ -5,25 +5,32 @@
 """
 Pong common
 - code shared by server and client
+- checksums: the server sends hashes of its quantized world, peers answer with the groups that differ
+- join snapshot: the whole world in one message, fragmented to fit the datagrams, acknowledged by the peer
 """
 
 from itertools import chain
-from math import cos, pi, sin
+from math import atan2, cos, pi, sin, sqrt
 from random import random
 import struct
 from time import time
-from typing import Tuple
+from typing import List, Tuple
+from zlib import crc32
 
 from Box2D import b2CircleShape, b2Contact, b2ContactListener, b2FixtureDef, b2PolygonShape, b2World
-import pyuv
 
 from common import DefaultInt
+from log import logger
 
 VERSION = '2022-08-04'
 
 # game
 BALL_ANGLE      = 0.3       # min starting throw angle
 BALL_ORBIT      = 1.5       # starting orbit
+BALL_PARK       = 1000      # pooled balls wait there, 1 unit apart, far from the arena
+BALL_POOL       = 16        # bodies created upfront, the pool grows when a server sends more balls
+BALL_POOL_MAX   = 4096      # bounds the growth, a bogus ball id must not allocate 65536 bodies
+BALL_RING       = 24        # max balls on the starting orbit, then a spiral is used
 BALL_SPEED_MAX  = 20
 BALL_SPEED_MED  = 15
 BALL_SPEED_MIN  = 7
@@ -52,6 +59,7 @@ ZONE_Y2         = 6
 
 # derived
 BALL_SPEED_MAX2  = BALL_SPEED_MAX * BALL_SPEED_MAX
+BALL_GOLDEN      = pi * (3 - sqrt(5))
 BALL_SPEED_STOP2 = BALL_SPEED_STOP * BALL_SPEED_STOP
 BALL_X2          = BALL_X / 2
 BALL_Y2          = BALL_Y / 2
@@ -59,6 +67,24 @@ PADDLE_X2        = PADDLE_X / 2
 PADDLE_Y2        = PADDLE_Y / 2
 PHYSICS_STEP     = 1 / PHYSICS_FPS
 
+# buttons, also sent over the network in Paddle
+BUTTON_CROSS    = 1 << 0
+BUTTON_CIRCLE   = 1 << 1
+BUTTON_SQUARE   = 1 << 2
+BUTTON_TRIANGLE = 1 << 3
+BUTTON_SELECT   = 1 << 4
+BUTTON_HOME     = 1 << 5
+BUTTON_START    = 1 << 6
+BUTTON_L3       = 1 << 7
+BUTTON_R3       = 1 << 8
+BUTTON_L1       = 1 << 9
+BUTTON_R1       = 1 << 10
+BUTTON_UP       = 1 << 11
+BUTTON_DOWN     = 1 << 12
+BUTTON_LEFT     = 1 << 13
+BUTTON_RIGHT    = 1 << 14
+BUTTON_TOUCH    = 1 << 15
+
 # hits
 HIT_BALL_BALL     = 1 << 0
 HIT_BALL_PADDLE   = 1 << 1
@@ -69,6 +95,47 @@ HIT_PADDLE_WALL   = 1 << 4
 TIMEOUT_PING       = 0.3
 TIMEOUT_DISCONNECT = 1.5
 
+# checksums
+CHECKSUM_BALLS   = 5                # 1st group of balls: walls + 4 paddles come before
+CHECKSUM_FIX     = 8                # max groups resent per correction request, the others wait for the next checksums
+CHECKSUM_FMT     = 'BH'             # 'H', number of balls, then the hashes
+CHECKSUM_FRAMES  = PHYSICS_FPS      # server sends its checksums every x physics frames
+CHECKSUM_GRID    = 0.25             # paddle position quantum
+CHECKSUM_GROUP   = 8                # balls per hash
+CHECKSUM_SECTORS = 16               # ball direction quantum
+CHECKSUM_SPEED   = 4                # ball speed quantum
+
+# join snapshot
+SNAPSHOT_FMT     = 'BBBHBI'         # version, player id, numDiv, balls, walls, frame, then walls + balls + paddles
+SNAPSHOT_PART    = 'BBBB'           # 'S', snapshot id, fragment, fragments
+SNAPSHOT_RESEND  = TIMEOUT_PING     # not acknowledged after that many sec => a fresh snapshot
+SNAPSHOT_VERSION = 1
+
+UDP_PAYLOAD = 1200                  # max datagram size, to avoid IP fragmentation
+
+WALL_CORNERS  = ((ZONE_X2, -ZONE_X2), (-ZONE_X2, -ZONE_X2), (-ZONE_X2, ZONE_X2), (ZONE_X2, ZONE_X2))
+WALL_VERTICES = {}                  # numDiv => prebuilt loop vertices
+
+
+def WallVertices(numDiv: int) -> List[Tuple[float, float]]:
+	"""Loop vertices for a given subdivision, built once then cached
+	"""
+	if vertices := WALL_VERTICES.get(numDiv): return vertices
+
+	if numDiv > 0:
+		vertices = []
+		for i in range(4):
+			x, y   = WALL_CORNERS[i]
+			x2, y2 = WALL_CORNERS[(i + 1) % 4]
+			dx     = (x2 - x) / numDiv
+			dy     = (y2 - y) / numDiv
+			for j in range(numDiv): vertices.append((x + dx * j, y + dy * j))
+	else:
+		vertices = list(WALL_CORNERS)
+
+	WALL_VERTICES[numDiv] = vertices
+	return vertices
+
 
 class UdpHeader:
 	structFmt  = 'H'
@@ -135,19 +202,52 @@ class Body:
 
 
 class Ball(Body):
-	structFmt  = 'BBBffffffb'
+	idFmt      = 'BH'
+	structFmt  = 'BHBffffffb'
 	structSize = struct.calcsize(structFmt)
 
 	def __init__(self, world: b2World, id: int, x: float, y: float, angle: float):
 		super(Ball, self).__init__('Ball', id, x, y, angle)
 
-		self.body = world.CreateDynamicBody(
+		self.active  = True
+		self.body    = world.CreateDynamicBody(
 			allowSleep     = False,
 			angularDamping = 0.03,
 			bullet         = True,
 			fixtures       = b2FixtureDef(shape=b2CircleShape(radius=BALL_X2), density=1.0, friction=0.2, restitution=0.95),
 			userData       = ['B', id, self],
 		)
+		self.fixture = self.body.fixtures[0]
+		self.filter  = self.fixture.filterData
+
+	def Activate(self, active: bool):
+		"""Pooled balls are switched on/off instead of being created/destroyed
+		- off = collisions filtered (its contacts are destroyed at the next step), parked asleep outside the arena,
+		  the broadphase proxy is kept: body.active would destroy and recreate it each time
+		- on = collisions back + woken up, the caller moves it back (ResetBall, Parse)
+		"""
+		if active == self.active: return
+		self.active = active
+
+		self.filter.maskBits    = 0xFFFF if active else 0
+		self.fixture.filterData = self.filter
+
+		# destroying a touching contact wakes the body up => allowed to fall asleep again while parked
+		body                 = self.body
+		body.sleepingAllowed = not active
+		if active:
+			body.awake = True
+		else:
+			body.transform = ((BALL_PARK + self.id, BALL_PARK), 0.0)
+			# also zeroes the velocities
+			body.awake = False
+
+	@staticmethod
+	def Id(message: bytes) -> int:
+		"""Ball id from a raw message, ids are 16 bit to allow hundreds of balls
+		"""
+		[_, id] = struct.unpack_from(Ball.idFmt, message)
+		return id
 
 	def Format(self) -> bytes:
 		body = self.body
@@ -163,6 +263,28 @@ class Ball(Body):
 		return True
 
 
+class BallBatch:
+	"""Many balls in one datagram: 'M' + count, followed by count Ball messages
+	"""
+	structFmt  = 'BH'
+	structSize = struct.calcsize(structFmt)
+	maxCount   = (UDP_PAYLOAD - UdpHeader.structSize - structSize) // Ball.structSize
+
+	def Format(self, messages: List[bytes]) -> List[bytes]:
+		datagrams = []
+		maxCount  = BallBatch.maxCount
+		for i in range(0, len(messages), maxCount):
+			chunk = messages[i: i + maxCount]
+			datagrams.append(struct.pack(BallBatch.structFmt, ord('M'), len(chunk)) + b''.join(chunk))
+		return datagrams
+
+	def Parse(self, message: bytes) -> List[bytes]:
+		[_, count] = struct.unpack_from(BallBatch.structFmt, message)
+		size       = Ball.structSize
+		start      = BallBatch.structSize
+		return [message[start + i * size: start + (i + 1) * size] for i in range(count)]
+
+
 class Paddle(Body):
 	structFmt  = 'BBBffffffih'
 	structSize = struct.calcsize(structFmt)
@@ -206,15 +328,21 @@ class Paddle(Body):
 class Pong(b2ContactListener):
 	def __init__(self, **kwargs):
 		super(Pong, self).__init__()
-		print('Pong', kwargs)
+		logger.Info('Pong', **kwargs)
 
 		# options
+		self.chaos     = DefaultInt(kwargs.get('chaos'), 0)
+		self.ballPool  = max(DefaultInt(kwargs.get('ball_pool'), BALL_POOL), self.chaos, 1)
 		self.host      = str(kwargs.get('host'))
 		self.port      = DefaultInt(kwargs.get('port'), 1234)
 		self.reconnect = DefaultInt(kwargs.get('reconnect'), 3)
 
 		self.address     = (self.host, self.port)
-		self.dirtyBall   = 0                                # which balls must be sent via network (flag)
+		self.ballBatch   = BallBatch()
+		self.bytesRecv   = 0
+		self.bytesSent   = 0
+		self.dirtyBall   = set()                            # which balls must be sent via network (ids)
+		self.dirtyPath   = set()                            # which balls must have their path predicted again (ids)
 		self.dirtyPaddle = 0                                # which paddles must be sent via network (flag)
 		self.dirtyWall   = 0                                # wall was hit => paddle id flag
 		self.doneFrame   = 0
@@ -223,13 +351,16 @@ class Pong(b2ContactListener):
 		self.id          = -1
 		self.ideltas     = [0] * 8                          # previous [pframe - iframe] deltas
 		self.iframe      = -1                               # frame where prev Physics was simulated
+		self.packetsRecv = 0
+		self.packetsSent = 0
 		self.pframe      = -1                               # frame where current Physics was simulated
 		self.sdelta      = 0                                # average of ideltas
 		self.seqRecv     = 0
-		self.seqSent     = 0
+		self.seqSent     = {}                               # address => next sequence, numbered per peer
 		self.start       = time()
 		self.udpHandle   = None                             # type: pyuv.UDP
 		self.udpHeader   = UdpHeader()
+		self.wallDiv     = -1                               # numDiv of the current wall fixture
 		self.walls       = [255] * 16                       # wall energy
 
 		self.world                   = b2World(gravity=(0, 0), doSleep=True)
@@ -255,24 +386,35 @@ class Pong(b2ContactListener):
 			Paddle(self.world, 2, 0                    , ZONE_Y2 - PADDLE_GAP , pi / 2),
 			Paddle(self.world, 3, ZONE_X2 - PADDLE_GAP , 0                    , 0     ),
 		]
-		self.balls = [Ball(self.world, 0, 0, 0, 0)]
+
+		# ball pool: only the first ball is active
+		self.pool = [Ball(self.world, i, 0, 0, 0) for i in range(self.ballPool)]
+		for ball in self.pool[1:]: ball.Activate(False)
+		self.balls = self.pool[:1]
 
 	# NETWORK
 	#########
 
 	def Send(self, address: Tuple[str, int], data: bytes or str, log: bool = False):
-		if log: print('>', data)
+		if log: logger.Debug('Send', address=address, data=data)
 		if isinstance(data, str): data = data.encode()
 
-		self.udpHandle.send(address, self.udpHeader.Format(self.seqSent) + data)
-		self.seqSent = (self.seqSent + 1) % 65536
+		seq = self.seqSent.get(address, 0)
+		self.udpHandle.send(address, self.udpHeader.Format(seq) + data)
+		self.seqSent[address] = (seq + 1) % 65536
+
+		self.bytesSent   += UdpHeader.structSize + len(data)
+		self.packetsSent += 1
 
 	# GAME
 	######
 
 	def AddBall(self, number: int = 1):
 		for _ in range(number):
-			ball = Ball(self.world, len(self.balls), 0, 0, 0)
+			if (numBall := len(self.balls)) >= len(self.pool): break
+
+			ball = self.pool[numBall]
+			ball.Activate(True)
 			self.balls.append(ball)
 			self.ResetBall(ball)
 
@@ -291,24 +433,62 @@ class Pong(b2ContactListener):
 		if health == 0: paddle.Alive(0)
 		if makeDirty: self.dirtyPaddle |= (1 << pid)
 
+	def Checksums(self, numBall: int) -> List[int]:
+		"""Canonical hashes of the quantized world
+		- ball positions change too fast to be compared across the latency => alive + owner + direction + speed,
+		  a ball off its path bounces elsewhere and then differs
+		:param numBall: balls of the server, missing ones are hashed as absent
+		:return: [walls, paddle 0 .. paddle 3, balls 0-7, balls 8-15, ...]
+		"""
+		sums = [crc32(bytes(self.walls))]
+
+		for paddle in self.paddles:
+			pos = paddle.body.position
+			sums.append(crc32(struct.pack('3i', paddle.alive, int(pos.x // CHECKSUM_GRID), int(pos.y // CHECKSUM_GRID))))
+
+		balls   = self.balls
+		numPool = len(balls)
+		for start in range(0, numBall, CHECKSUM_GROUP):
+			values = []
+			for bid in range(start, min(start + CHECKSUM_GROUP, numBall)):
+				if bid < numPool:
+					ball = balls[bid]
+					vel  = ball.body.linearVelocity
+					values += (
+						ball.alive,
+						ball.parentId,
+						int((atan2(vel.y, vel.x) + pi) * CHECKSUM_SECTORS / (2 * pi)),
+						int(sqrt(vel.x * vel.x + vel.y * vel.y) // CHECKSUM_SPEED),
+					)
+				else:
+					values += (-1, -1, -1, -1)
+			sums.append(crc32(struct.pack(f'{len(values)}i', *values)))
+
+		return sums
+
 	def Contact(self, contact: b2Contact, isEnd: bool):
 		bodyA         = contact.fixtureA.body
 		bodyB         = contact.fixtureB.body
 		nameA, idA, A = bodyA.userData
 		nameB, idB, B = bodyB.userData
 
+		# a bounce on a wall or a paddle changes the path, ball-ball + sun contacts are left to the aging
+		if not isEnd:
+			if nameA == 'B' and nameB in 'PW': self.dirtyPath.add(idA)
+			elif nameB == 'B' and nameA in 'PW': self.dirtyPath.add(idB)
+
 		if nameA == 'B':
-			self.dirtyBall |= (1 << idA)
+			self.dirtyBall.add(idA)
 			if nameB == 'B':
 				if not isEnd: self.hitFlag |= HIT_BALL_BALL
-				self.dirtyBall |= (1 << idB)
+				self.dirtyBall.add(idB)
 			elif nameB == 'P':
 				if not isEnd: self.hitFlag |= HIT_BALL_PADDLE
 				self.dirtyPaddle |= (1 << idB)
 				A.flag |= (1 << idB)
 				A.parentId = idB
 			elif nameB == 'S':
-				self.dirtyBall |= (1 << idB)
+				self.dirtyBall.add(idB)
 				A.flag |= 128
 			elif nameB == 'W':
 				self.ContactBallWall(A, contact.childIndexB, isEnd)
@@ -317,7 +497,7 @@ class Pong(b2ContactListener):
 			self.dirtyPaddle |= (1 << idA)
 			if nameB == 'B':
 				if not isEnd: self.hitFlag |= HIT_BALL_PADDLE
-				self.dirtyBall |= (1 << idB)
+				self.dirtyBall.add(idB)
 				B.flag |= (1 << idA)
 				B.parentId = idA
 			elif nameB == 'P':
@@ -328,7 +508,7 @@ class Pong(b2ContactListener):
 		#
 		elif nameA == 'S':
 			if nameB == 'B':
-				self.dirtyBall |= (1 << idA)
+				self.dirtyBall.add(idA)
 				B.flag |= 128
 		#
 		elif nameA == 'W':
@@ -359,36 +539,102 @@ class Pong(b2ContactListener):
 
 				self.dirtyWall |= (1 << childId)
 
-		self.dirtyBall |= (1 << ball.id)
+		self.dirtyBall.add(ball.id)
 		if ball.parentId >= 0 and self.walls[childId] > 0: ball.parentId = -1
 
-	def CreateWalls(self):
-		numDiv   = self.numDiv
-		segments = [(ZONE_X2, -ZONE_X2), (-ZONE_X2, -ZONE_X2), (-ZONE_X2, ZONE_X2), (ZONE_X2, ZONE_X2)]
-
-		if numDiv > 0:
-			vertices = []
-			for i in range(4):
-				x, y   = segments[i]
-				x2, y2 = segments[(i + 1) % 4]
-				dx     = (x2 - x) / numDiv
-				dy     = (y2 - y) / numDiv
-				for j in range(numDiv): vertices.append((x + dx * j, y + dy * j))
-		else:
-			vertices = segments
+	def ControlPaddle(self, paddle: Paddle, pad: int, axisX: float = 0.0, axisY: float = 0.0, triggerL: float = -1.0, triggerR: float = -1.0) -> bool:
+		"""Apply buttons + axes to a paddle, shared by players and bots
+		:return: True if the paddle was moved
+		"""
+		moved = False
+
+		if pad & BUTTON_DOWN:  axisY += 1
+		if pad & BUTTON_LEFT:  axisX -= 1
+		if pad & BUTTON_RIGHT: axisX += 1
+		if pad & BUTTON_UP:    axisY -= 1
+
+		axisX = min(max(axisX, -1), 1)
+		axisY = min(max(axisY, -1), 1)
+
+		horiz  = paddle.angle0 > 0
+		body   = paddle.body
+		center = body.worldCenter
+
+		# hitting the ball
+		if (pad & (BUTTON_SQUARE | BUTTON_L1)) or triggerL > -1:
+			moved = True
+			value = (1 if (pad & (BUTTON_SQUARE | BUTTON_L1)) else (triggerL + 1) / 2) * PADDLE_HIT
+			if horiz:
+				if paddle.position0[1] < 0:
+					if body.angle < pi / 2 + pi / 16: body.ApplyAngularImpulse(value, True)
+				elif body.angle > pi / 2 - pi / 16: body.ApplyAngularImpulse(-value, True)
+			elif body.angle < pi / 16: body.ApplyAngularImpulse(value, True)
+
+		if (pad & (BUTTON_CIRCLE | BUTTON_R1)) or triggerR > -1:
+			moved = True
+			value = (1 if (pad & (BUTTON_CIRCLE | BUTTON_R1)) else (triggerR + 1) / 2) * PADDLE_HIT
+			if horiz:
+				if paddle.position0[1] < 0:
+					if body.angle > pi / 2 - pi / 16: body.ApplyAngularImpulse(-value, True)
+				elif body.angle < pi / 2 + pi / 16: body.ApplyAngularImpulse(value, True)
+			elif body.angle > -pi / 16: body.ApplyAngularImpulse(-value, True)
+
+		# movement
+		if axisX and horiz:
+			moved = True
+			body.ApplyLinearImpulse((PADDLE_IMPULSE * axisX, 0), center, True)
+		if axisY and not horiz:
+			moved = True
+			body.ApplyLinearImpulse((0, -PADDLE_IMPULSE * axisY), center, True)
+
+		paddle.buttons = pad
+		return moved
+
+	def CreateWalls(self) -> bool:
+		"""Rebuild the wall fixture, only if the layout changed
+		"""
+		if self.wallDiv == self.numDiv: return False
+
+		vertices = WallVertices(self.numDiv)
 
 		if len(self.wall.fixtures): self.wall.DestroyFixture(self.wall.fixtures[0])
 		self.wall.CreateLoopFixture(vertices=vertices)
-		self.walls = [255] * (len(vertices) + 1)
+		self.wallDiv = self.numDiv
+
+		numWall = len(vertices) + 1
+		if len(self.walls) != numWall: self.walls = [255] * numWall
+		return True
 
 	def DeleteBall(self):
 		if len(self.balls) > 1:
 			ball = self.balls.pop()
-			self.world.DestroyBody(ball.body)
+			ball.Activate(False)
 
 	def EndContact(self, contact: b2Contact):
 		self.Contact(contact, True)
 
+	def FormatSnapshot(self, pid: int) -> bytes:
+		"""Whole world for a joining peer, the bodies use their network codecs
+		:param pid: slot given to the peer
+		"""
+		return b''.join([
+			struct.pack(SNAPSHOT_FMT, SNAPSHOT_VERSION, pid, self.numDiv, len(self.balls), len(self.walls), self.doneFrame),
+			bytes(self.walls),
+			*(ball.Format() for ball in self.balls),
+			*(paddle.Format() for paddle in self.paddles),
+		])
+
+	def GrowPool(self, count: int):
+		"""Create parked balls until the pool holds count of them
+		- a client's pool is sized from its own options, a --chaos 256 server sends ids >= 16
+		"""
+		pool  = self.pool
+		count = min(count, BALL_POOL_MAX)
+		while len(pool) < count:
+			ball = Ball(self.world, len(pool), 0, 0, 0)
+			ball.Activate(False)
+			pool.append(ball)
+
 	def Interpolate(self, interpolate: bool):
 		if not interpolate or self.sdelta < 1:
 			for obj in chain(self.balls, self.paddles):
@@ -440,39 +686,63 @@ class Pong(b2ContactListener):
 
 	def NewGame(self, numDiv: int = 0):
 		if numDiv > 0: self.numDiv = numDiv
-		if len(self.walls) != self.numDiv: self.CreateWalls()
-
-		for obj in chain(self.balls, self.paddles): obj.Reset()
-		self.ResetBalls()
-
-		for i in range(len(self.walls)): self.walls[i] = 255
+		self.CreateWalls()
+		self.ResetWorld()
+
+	def ParseSnapshot(self, payload: bytes) -> Tuple[int, int] or None:
+		"""Replace the world with a snapshot
+		:return: (player id, server frame), None for another version or a truncated payload
+		"""
+		offset = struct.calcsize(SNAPSHOT_FMT)
+		if len(payload) < offset: return None
+
+		version, pid, numDiv, numBall, numWall, frame = struct.unpack_from(SNAPSHOT_FMT, payload)
+		if version != SNAPSHOT_VERSION: return None
+		if len(payload) < offset + numWall + numBall * Ball.structSize + len(self.paddles) * Paddle.structSize: return None
+
+		if numDiv != self.numDiv:
+			self.numDiv = numDiv
+			self.CreateWalls()
+
+		self.walls[:numWall] = payload[offset: offset + numWall]
+		offset += numWall
+
+		self.SetBalls(numBall)
+		numPool = len(self.balls)
+		for _ in range(numBall):
+			if (bid := struct.unpack_from(Ball.idFmt, payload, offset)[1]) < numPool:
+				self.balls[bid].Parse(payload[offset: offset + Ball.structSize])
+				self.dirtyPath.add(bid)
+			offset += Ball.structSize
 
-		for pid, paddle in enumerate(self.paddles):
-			self.CalculateHealth(pid, False)
-			paddle.Alive(1)
+		for paddle in self.paddles:
+			paddle.Parse(payload[offset: offset + Paddle.structSize])
+			offset += Paddle.structSize
 
-		self.doneFrame = 0
-		self.frame     = 0
-		self.iframe    = -1
-		self.pframe    = -1
-		self.start     = time()
+		for i in range(len(self.paddles)): self.CalculateHealth(i, False)
+		return pid, frame
 
 	def Physics(self):
 		# sun gravity
+		# .x/.y: b2Vec2 attribute access is twice as fast as indexing
 		for ball in self.balls:
 			body = ball.body
 			pos  = body.position
-			grav = 0.02 / (pos[0] * pos[0] + pos[1] * pos[1] + 0.1)
+			posX = pos.x
+			posY = pos.y
+			grav = 0.02 / (posX * posX + posY * posY + 0.1)
 
 			# hit sun
 			if ball.flag & 128: grav = -grav * 15 - 10
 
-			force = (-pos[0] * grav, -pos[1] * grav)
+			force = (-posX * grav, -posY * grav)
 			body.ApplyForceToCenter(force, True)
 
 			# too slow ball? => accelerate
-			vel    = ball.body.linearVelocity
-			speed2 = (vel[0] * vel[0] + vel[1] * vel[1])
+			vel    = body.linearVelocity
+			velX   = vel.x
+			velY   = vel.y
+			speed2 = (velX * velX + velY * velY)
 			if speed2 < BALL_SPEED_STOP2 * BALL_SPEED_STOP2: self.ResetBall(ball, False)
 
 		# move paddles
@@ -482,11 +752,12 @@ class Pong(b2ContactListener):
 
 			# move back towards original position
 			if paddle.alive:
-				deltaX = (paddle.position0[0] - ppos[0]) if paddle.angle0 == 0 else 0
-				deltaY = (paddle.position0[1] - ppos[1]) if paddle.angle0 != 0 else 0
+				vel    = body.linearVelocity
+				deltaX = (paddle.position0[0] - ppos.x) if paddle.angle0 == 0 else 0
+				deltaY = (paddle.position0[1] - ppos.y) if paddle.angle0 != 0 else 0
 				force  = (
-					-body.linearVelocity[0] * 1 + deltaX * 5,
-					-body.linearVelocity[1] * 1 + deltaY * 5
+					-vel.x * 1 + deltaX * 5,
+					-vel.y * 1 + deltaY * 5
 				)
 				body.ApplyTorque((paddle.angle0 - body.angle) * 3 - body.angularVelocity * 0.35, True)
 
@@ -494,7 +765,7 @@ class Pong(b2ContactListener):
 			else:
 				ball  = self.balls[0]
 				bpos  = ball.body.position
-				delta = (bpos[0] - ppos[0], bpos[1] - ppos[1])
+				delta = (bpos.x - ppos.x, bpos.y - ppos.y)
 				grav  = 1 / (delta[0] * delta[0] + delta[1] * delta[1] + 8)
 				force = (delta[0] * grav, delta[1] * grav)
 
@@ -511,7 +782,7 @@ class Pong(b2ContactListener):
 
 		for ball in self.balls: ball.flag = 0
 
-		self.dirtyBall   = 0
+		self.dirtyBall.clear()
 		self.hitFlag     = 0
 		self.dirtyPaddle = 0
 		self.dirtyWall   = 0
@@ -554,19 +825,48 @@ class Pong(b2ContactListener):
 		speed = BALL_SPEED_MIN + random() * (BALL_SPEED_MED - BALL_SPEED_MIN)
 
 		if recenter:
-			alpha         = ball.id * 2 * pi / len(self.balls)
+			numBall = len(self.balls)
+			if numBall <= BALL_RING:
+				alpha = ball.id * 2 * pi / numBall
+				orbit = BALL_ORBIT
+			# chaos: sunflower spiral around the orbit, so hundreds of balls don't overlap
+			else:
+				alpha = ball.id * BALL_GOLDEN
+				orbit = sqrt(BALL_ORBIT * BALL_ORBIT + ball.id * BALL_X * BALL_X * 0.5)
+
 			body          = ball.body
-			body.position = (BALL_ORBIT * cos(alpha), BALL_ORBIT * sin(alpha))
+			body.position = (orbit * cos(alpha), orbit * sin(alpha))
 
 		body                = ball.body
 		ball.alive          = 1
 		body.linearVelocity = (speed * cos(angle) * (1 if random() > 0.5 else -1), speed * sin(angle) * (1 if random() > 0.5 else -1))
 
-		self.dirtyBall |= (1 << ball.id)
+		self.dirtyBall.add(ball.id)
+		self.dirtyPath.add(ball.id)
 
 	def ResetBalls(self, recenter: bool = True):
 		for ball in self.balls: self.ResetBall(ball, recenter)
 
+	def ResetWorld(self):
+		"""Restore balls, paddles, walls and timers in place, no Box2D allocation
+		"""
+		for obj in chain(self.balls, self.paddles): obj.Reset()
+		self.ResetBalls()
+
+		for i in range(len(self.walls)): self.walls[i] = 255
+
+		for pid, paddle in enumerate(self.paddles):
+			self.CalculateHealth(pid, False)
+			paddle.Alive(1)
+
+		self.doneFrame = 0
+		self.frame     = 0
+		self.iframe    = -1
+		self.pframe    = -1
+		self.start     = time()
+
 	def SetBalls(self, count: int):
+		self.GrowPool(count)
+		count = min(max(count, 1), len(self.pool))
 		while len(self.balls) > count: self.DeleteBall()
-		while len(self.balls) < count: self.AddBall()
+		if len(self.balls) < count: self.AddBall(count - len(self.balls))
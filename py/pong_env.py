@@ -0,0 +1,215 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong environment
+- gym-style reset/step over K independent Pong worlds, stepped in lockstep
+- no wall-clock, no network, no pygame
+- observations, rewards and flags are preallocated numpy arrays, reused at every step
+"""
+
+import random
+from typing import Dict, Tuple
+
+import numpy as np
+
+from pong_ai import PongAI
+from pong_common import BUTTON_DOWN, BUTTON_L1, BUTTON_LEFT, BUTTON_R1, BUTTON_RIGHT, BUTTON_UP, PHYSICS_FPS, Pong, \
+	ZONE_X2
+
+ENV_ACTIONS = 5                     # 0: nothing, 1: move -, 2: move +, 3: rotate left, 4: rotate right
+ENV_BALL    = 4                     # x, y, vx, vy
+ENV_PADDLE  = 6                     # x, y, vx, vy, angle, alive
+
+
+class PongEnv:
+	def __init__(
+			self,
+			numEnv: int = 8,
+			numBall: int = 1,
+			agent: int = 0,
+			opponents: bool = True,
+			difficulty: float = 0.7,
+			frameSkip: int = 1,
+			maxFrames: int = PHYSICS_FPS * 60,
+			numDiv: int = 0,
+			seed: int = None,
+	):
+		"""
+		:param numEnv: number of worlds
+		:param numBall: balls per world, fixed => fixed observation size
+		:param agent: paddle controlled by the actions
+		:param opponents: other paddles are played by PongAI, otherwise they stay idle
+		:param frameSkip: physics frames per step, the action is repeated
+		:param maxFrames: truncate an episode after that many physics frames
+		"""
+		self.agent     = agent
+		self.frameSkip = max(frameSkip, 1)
+		self.maxFrames = maxFrames
+		self.numBall   = max(numBall, 1)
+		self.numDiv    = numDiv
+		self.numEnv    = numEnv
+		self.seed      = seed
+
+		self.pongs  = [Pong(ball_pool=self.numBall) for _ in range(numEnv)]
+		self.ais    = [PongAI(pong, difficulty) for pong in self.pongs] if opponents else []
+		self.Seed(seed)
+		self.others = [pid for pid in range(len(self.pongs[0].paddles)) if pid != agent]
+
+		numPaddle    = len(self.pongs[0].paddles)
+		self.obsSize = self.numBall * ENV_BALL + numPaddle * ENV_PADDLE + numPaddle
+
+		# action => buttons, depends on the paddle orientation
+		horiz        = self.pongs[0].paddles[agent].angle0 > 0
+		self.buttons = [
+			0,
+			BUTTON_LEFT if horiz else BUTTON_DOWN,
+			BUTTON_RIGHT if horiz else BUTTON_UP,
+			BUTTON_L1,
+			BUTTON_R1,
+		]
+
+		# observation: balls + paddles are scaled to the zone, angle + alive are kept
+		self.scales = np.full(self.obsSize, 1 / ZONE_X2, dtype=np.float32)
+		self.values = [0.0] * self.obsSize
+		for pid in range(numPaddle):
+			start = self.numBall * ENV_BALL + pid * ENV_PADDLE
+			self.scales[start + 4: start + 6] = 1
+
+		# preallocated outputs
+		self.before        = np.zeros(numPaddle, dtype=np.float64)
+		self.finalMask     = np.zeros(numEnv, dtype=bool)
+		self.finals        = np.zeros((numEnv, self.obsSize), dtype=np.float32)
+		self.health        = np.zeros((numEnv, numPaddle), dtype=np.float64)
+		self.observations  = np.zeros((numEnv, self.obsSize), dtype=np.float32)
+		self.rewards       = np.zeros(numEnv, dtype=np.float32)
+		self.terminations  = np.zeros(numEnv, dtype=bool)
+		self.truncations   = np.zeros(numEnv, dtype=bool)
+
+		# autoreset overwrites the observation of a finished world => its last one is kept there
+		self.info = {'final_observation': self.finals, '_final_observation': self.finalMask}
+
+	def Health(self, k: int):
+		"""Wall energy per paddle, in [0, 1]
+		"""
+		pong   = self.pongs[k]
+		walls  = pong.walls
+		numDiv = pong.numDiv
+		total  = 255 * numDiv
+		health = self.health[k]
+		for pid in range(len(health)):
+			start       = pid * numDiv
+			health[pid] = sum(walls[start: start + numDiv]) / total
+
+	def Observe(self, k: int):
+		"""Values are gathered in a reused list, then copied + scaled in one go
+		"""
+		values = self.values
+		i      = 0
+
+		for ball in self.pongs[k].balls:
+			body = ball.body
+			pos  = body.position
+			vel  = body.linearVelocity
+			values[i]     = pos.x
+			values[i + 1] = pos.y
+			values[i + 2] = vel.x
+			values[i + 3] = vel.y
+			i += ENV_BALL
+
+		for paddle in self.pongs[k].paddles:
+			body = paddle.body
+			pos  = body.position
+			vel  = body.linearVelocity
+			values[i]     = pos.x
+			values[i + 1] = pos.y
+			values[i + 2] = vel.x
+			values[i + 3] = vel.y
+			values[i + 4] = body.angle
+			values[i + 5] = paddle.alive
+			i += ENV_PADDLE
+
+		obs    = self.observations[k]
+		obs[:] = values
+		obs   *= self.scales
+		obs[i:] = self.health[k]
+
+	def ResetEnv(self, k: int):
+		pong = self.pongs[k]
+		pong.NewGame(self.numDiv)
+		pong.SetBalls(self.numBall)
+		pong.dirtyBall.clear()
+		pong.dirtyPath.clear()
+		pong.frame = 0
+
+		self.Health(k)
+		self.Observe(k)
+
+	def Seed(self, seed: int or None):
+		"""Ball throws use random, each AI opponent gets its own generator from the same seed
+		"""
+		if seed is None: return
+		random.seed(seed)
+		for ai, child in zip(self.ais, np.random.SeedSequence(seed).spawn(len(self.ais))):
+			ai.rng = np.random.default_rng(child)
+
+	# GYM API
+	#########
+
+	def reset(self, seed: int = None) -> Tuple[np.ndarray, Dict]:
+		self.Seed(seed)
+		self.finalMask[:] = False
+
+		for k in range(self.numEnv): self.ResetEnv(k)
+		return self.observations, self.info
+
+	def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+		"""Step all worlds, finished worlds are reset automatically
+		:param actions: [numEnv] in [0, ENV_ACTIONS)
+		:return: observations, rewards, terminations, truncations, info => same arrays at every call,
+			info['final_observation'][k] is the last observation of a world reset this step, see info['_final_observation']
+		"""
+		agent   = self.agent
+		buttons = self.buttons
+		others  = self.others
+		health  = self.health
+		numOther = len(others)
+		self.finalMask[:] = False
+
+		for k, pong in enumerate(self.pongs):
+			pad     = buttons[actions[k]]
+			paddle  = pong.paddles[agent]
+			ai      = self.ais[k] if self.ais else None
+			before  = self.before
+			before[:] = health[k]
+
+			for _ in range(self.frameSkip):
+				if ai:
+					for pid, aiPad in zip(others, ai.Controls(others).tolist()):
+						if aiPad and pong.paddles[pid].alive: pong.ControlPaddle(pong.paddles[pid], aiPad)
+				if paddle.alive: pong.ControlPaddle(paddle, pad)
+
+				pong.Physics()
+				pong.frame += 1
+
+			pong.dirtyBall.clear()
+			if not ai: pong.dirtyPath.clear()
+
+			# reward: damage dealt to the others - damage received
+			self.Health(k)
+			lost = before - health[k]
+			self.rewards[k] = (lost.sum() - lost[agent]) / numOther - lost[agent]
+
+			terminated = not paddle.alive or not any(pong.paddles[pid].alive for pid in others)
+			truncated  = pong.frame >= self.maxFrames
+			self.terminations[k] = terminated
+			self.truncations[k]  = truncated
+
+			self.Observe(k)
+			if terminated or truncated:
+				self.finals[k]    = self.observations[k]
+				self.finalMask[k] = True
+				self.ResetEnv(k)
+
+		return self.observations, self.rewards, self.terminations, self.truncations, self.info
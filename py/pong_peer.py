@@ -0,0 +1,234 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong peer
+- client side networking without any display: used by the client and the headless bots
+"""
+
+import struct
+from time import time
+from typing import Tuple
+
+import pyuv
+
+from log import logger
+from pong_ai import PongAI
+from pong_common import Ball, CHECKSUM_FMT, Paddle, Pong, SNAPSHOT_PART, TIMEOUT_DISCONNECT, TIMEOUT_PING, UdpHeader
+
+
+class PongPeer(Pong):
+	def __init__(self, **kwargs):
+		super(PongPeer, self).__init__(**kwargs)
+
+		self.ai          = PongAI(self)
+		self.capturer    = None                             # type: Capture, received datagrams
+		self.checkMiss   = set()                            # checksum groups that differed last time
+		self.clientTcp   = None                             # type: pyuv.TCP
+		self.connected   = False
+		self.desyncs     = 0                                # checksum groups that differed twice in a row
+		self.hasMoved    = False
+		self.packetsLate = 0                                # older or duplicate sequence
+		self.packetsLost = 0                                # sequence gaps
+		self.pingSent    = 0                                # when the last 'p' was sent, 0 if answered
+		self.pingTime    = time()
+		self.pongTime    = time()
+		self.rtts        = []                               # round trip times, from 'p' => 'q'
+		self.running     = True
+		self.serverFrame = 0                                # server doneFrame of the last snapshot
+		self.snapCount   = 0                                # fragments of the snapshot being received
+		self.snapDone    = -1                               # id of the last applied snapshot, its duplicates are only acknowledged
+		self.snapParts   = {}                               # fragment index => data, of the snapshot being received
+		self.snapId      = -1                               # id of the snapshot being received
+
+		self.loop     = pyuv.Loop.default_loop()
+		self.signal_h = pyuv.Signal(self.loop)
+
+	# HELPERS
+	#########
+
+	def UpdateTitle(self, force: bool = True):
+		pass
+
+	# NETWORK
+	#########
+
+	def CheckReconnect(self):
+		mustPing = 0
+		now      = time()
+		if now > self.pongTime + TIMEOUT_DISCONNECT:
+			mustPing = 2
+		elif now > self.pongTime + TIMEOUT_PING:
+			mustPing = 1
+
+		if mustPing and now > self.pingTime + TIMEOUT_PING:
+			if mustPing == 2:
+				logger.Warning('CheckReconnect.disconnected', address=self.address)
+				self.connected = False
+				# the server may have forgotten us => its snapshot ids start again
+				self.snapDone = -1
+				self.snapId   = -1
+				self.Send(self.address, struct.pack('Bb', ord('I'), self.id))
+			else:
+				self.Ping()
+			self.pingTime = now
+
+	def CompareChecksums(self, data: bytes):
+		"""A group differing twice in a row is a desync, not an update still in flight => ask the server for it
+		"""
+		numBall = struct.unpack_from(CHECKSUM_FMT, data)[1]
+		offset  = struct.calcsize(CHECKSUM_FMT)
+		theirs  = struct.unpack_from(f'{(len(data) - offset) // 4}I', data, offset)
+		misses  = {group for group, (their, mine) in enumerate(zip(theirs, self.Checksums(numBall))) if their != mine}
+		# own paddle: this peer drives it
+		misses.discard(self.id + 1)
+
+		confirmed      = misses & self.checkMiss
+		self.checkMiss = misses
+		if confirmed:
+			self.desyncs += len(confirmed)
+			self.Send(self.address, bytes([ord('h'), *sorted(confirmed)]))
+
+	def Connect(self, host: str = '127.0.0.1'):
+		self.udpHandle = pyuv.UDP(self.loop)
+		self.udpHandle.bind((host, 0))
+		self.udpHandle.start_recv(self.UdpClientRead)
+		self.Send(self.address, struct.pack('Bb', ord('I'), self.id))
+
+	def ParseBall(self, message: bytes, now: float):
+		bid = Ball.Id(message)
+		if bid >= len(self.balls): self.SetBalls(bid + 1)
+
+		if bid < len(self.balls):
+			self.balls[bid].Parse(message)
+			self.dirtyPath.add(bid)
+			self.doneFrame = 0
+			self.start     = now
+
+	def Ping(self):
+		self.Send(self.address, b'p')
+		if not self.pingSent: self.pingSent = time()
+
+	def ReadSnapshot(self, data: bytes, now: float):
+		"""Gather the fragments, a newer snapshot replaces an incomplete one
+		- a duplicate of the applied snapshot is acknowledged again (the 's' may be lost), never applied twice
+		"""
+		if len(data) < struct.calcsize(SNAPSHOT_PART): return
+		_, snapId, index, count = struct.unpack_from(SNAPSHOT_PART, data)
+		if snapId == self.snapDone:
+			self.Send(self.address, struct.pack('BB', ord('s'), snapId))
+			return
+
+		if snapId != self.snapId:
+			# late fragment of an older snapshot
+			if self.snapId >= 0 and (snapId - self.snapId) % 256 >= 128: return
+			self.snapCount = count
+			self.snapId    = snapId
+			self.snapParts.clear()
+
+		if index >= count or count != self.snapCount: return
+		self.snapParts[index] = data[struct.calcsize(SNAPSHOT_PART):]
+		if len(self.snapParts) < count: return
+
+		result = self.ParseSnapshot(b''.join(self.snapParts[i] for i in range(count)))
+		self.snapParts.clear()
+		if not result: return
+
+		self.id, self.serverFrame = result
+		self.doneFrame = 0
+		self.snapDone  = snapId
+		self.start     = now
+		self.Send(self.address, struct.pack('BB', ord('s'), snapId))
+		self.UpdateTitle()
+
+	def Signal(self, handle: pyuv.Signal, signum: int):
+		self.signal_h.close()
+
+		if self.clientTcp:
+			self.clientTcp.close()
+			self.clientTcp = None
+
+		if self.udpHandle:
+			self.udpHandle.close()
+			self.udpHandle = None
+
+		self.running = False
+
+	def Sync(self):
+		if self.id < 0 or self.id > 3: return
+
+		if self.hasMoved or (self.dirtyPaddle & (1 << self.id)):
+			paddle = self.paddles[self.id]
+			self.Send(self.address, paddle.Format())
+
+		if self.dirtyBall:
+			for ball in self.balls:
+				if ball.parentId == self.id and (ball.flag & (1 << self.id)):
+					self.Send(self.address, ball.Format())
+
+		self.hasMoved = False
+
+	def UdpClientRead(self, handle: pyuv.UDP, address: Tuple[str, int], flags: int, data: bytes, error: int):
+		if data is None: return
+		if self.capturer: self.capturer.Write(address, data)
+
+		self.bytesRecv   += len(data)
+		self.packetsRecv += 1
+
+		# the server numbers the datagrams per peer => gaps are losses
+		seq   = self.udpHeader.Parse(data[:UdpHeader.structSize])
+		delta = (seq - self.seqRecv) % 65536
+		if self.packetsRecv > 1 and (delta == 0 or delta >= 32768):
+			self.packetsLate += 1
+		else:
+			if self.packetsRecv > 1: self.packetsLost += delta - 1
+			self.seqRecv = seq
+
+		data           = data[UdpHeader.structSize:]
+		now            = time()
+		self.connected = True
+		self.pongTime  = now
+
+		# 1) game
+		# ball
+		if data[0] == ord('B'): self.ParseBall(data[:Ball.structSize], now)
+
+		# balls
+		elif data[0] == ord('M'):
+			for message in self.ballBatch.Parse(data): self.ParseBall(message, now)
+
+		# paddle
+		elif data[0] == ord('P'):
+			pid = data[1]
+			if 0 <= pid < len(self.paddles): self.paddles[pid].Parse(data[:Paddle.structSize])
+			data = data[Paddle.structSize:]
+
+		# wall
+		elif data[0] == ord('W'):
+			wid    = data[1]
+			health = data[2]
+			if wid < len(self.walls):
+				self.walls[wid] = health
+				self.CalculateHealth(wid // self.numDiv, False)
+
+			data = data[4:]
+
+		# all walls, answer to a checksum mismatch
+		elif data[0] == ord('V'):
+			numWall = min(data[1], len(self.walls), len(data) - 2)
+			self.walls[:numWall] = data[2: 2 + numWall]
+			for pid in range(len(self.paddles)): self.CalculateHealth(pid, False)
+
+		# 2) connection
+		elif data[0] == ord('p'): self.Send(self.address, b'q')
+		elif data[0] == ord('q'):
+			if self.pingSent:
+				self.rtts.append(now - self.pingSent)
+				self.pingSent = 0
+
+		elif data[0] == ord('H'): self.CompareChecksums(data)
+
+		elif data[0] == ord('S'): self.ReadSnapshot(data, now)
+		else:
+			logger.Warning('UdpClientRead.unknown', data=data[:32])
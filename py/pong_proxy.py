@@ -0,0 +1,224 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong proxy
+- UDP relay between the clients and the server: python __main__.py --proxy 9001 --port 9000, clients use --port 9001
+- impairments per direction, 'up' = client => server, 'down' = server => client: --latency 40,60 --loss 2
+- latency + jitter (ms), loss/duplicate/reorder (%), bandwidth cap (kbit/s, the excess queues then drops)
+- one upstream socket per client => the server still sees one address per client
+- summary every PROXY_LOG sec, --proxy-log FILE: one CSV line per datagram
+"""
+
+import heapq
+from random import Random
+import signal
+from time import sleep, time
+from typing import List, Tuple
+
+import pyuv
+
+from common import DefaultFloat, DefaultInt
+from log import logger
+
+PROXY_IDLE  = 30.0                          # forget a client after that many silent sec
+PROXY_LOG   = 5.0                           # summary every x sec
+PROXY_QUEUE = 0.5                           # bandwidth cap: drop when the link is busy for longer, in sec
+PROXY_SLEEP = 0.0005                        # loop pause, bounds the timing precision
+
+
+def Directions(value: str, default: float = 0.0) -> Tuple[float, float]:
+	"""'40' => (40, 40), '40,60' => (up, down)
+	"""
+	items = [DefaultFloat(item, default) for item in str(value or '').split(',')]
+	if len(items) < 2: items.append(items[0])
+	return items[0], items[1]
+
+
+class Impairment:
+	"""Network conditions for one direction
+	"""
+	def __init__(self, name: str, rng: Random, latency: float, jitter: float, loss: float, duplicate: float, reorder: float, bandwidth: float):
+		"""
+		:param latency: ms
+		:param jitter: ms, uniform in [-jitter, +jitter]
+		:param loss: %
+		:param duplicate: %
+		:param reorder: %, the datagram skips the latency and overtakes the queued ones
+		:param bandwidth: kbit/s, 0 = unlimited
+		"""
+		self.bandwidth = bandwidth * 125    # bytes/s
+		self.duplicate = duplicate / 100
+		self.jitter    = jitter / 1000
+		self.latency   = latency / 1000
+		self.linkFree  = 0.0                # when the capped link has sent its backlog
+		self.loss      = loss / 100
+		self.name      = name
+		self.reorder   = reorder / 100
+		self.rng       = rng
+		self.stats     = dict.fromkeys(['recv', 'sent', 'lost', 'dup', 'reorder', 'capped', 'bytes'], 0)
+
+	def Delays(self, now: float, size: int) -> Tuple[List[float], str]:
+		"""When the datagram (and its copy) must be delivered
+		:return: [delivery times], action
+		"""
+		rng   = self.rng
+		stats = self.stats
+		stats['recv'] += 1
+
+		if rng.random() < self.loss:
+			stats['lost'] += 1
+			return [], 'lost'
+
+		# serialization on the capped link, a full queue drops the datagram
+		start = now
+		if self.bandwidth > 0:
+			if self.linkFree - now > PROXY_QUEUE:
+				stats['capped'] += 1
+				return [], 'capped'
+			start         = max(now, self.linkFree) + size / self.bandwidth
+			self.linkFree = start
+
+		action = 'sent'
+		if rng.random() < self.reorder:
+			stats['reorder'] += 1
+			times  = [start]
+			action = 'reorder'
+		else:
+			times = [start + max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))]
+
+		if rng.random() < self.duplicate:
+			stats['dup'] += 1
+			times.append(start + max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+			action = 'dup'
+
+		return times, action
+
+
+class PongProxy:
+	def __init__(self, **kwargs):
+		logger.Info('PongProxy', **kwargs)
+
+		# options
+		self.host      = str(kwargs.get('host'))
+		self.port      = DefaultInt(kwargs.get('port'), 9000)
+		self.proxy     = DefaultInt(kwargs.get('proxy'), 9001)
+		self.proxyLog  = kwargs.get('proxy_log') or ''
+
+		rng        = Random()
+		ups, downs = zip(*(Directions(kwargs.get(name)) for name in ('latency', 'jitter', 'loss', 'duplicate', 'reorder', 'bandwidth')))
+
+		self.clients   = {}                 # type: Dict[Tuple[str, int], list], address => [upstream socket, last seen]
+		self.down      = Impairment('down', rng, *downs)
+		self.logFile   = None
+		self.loop      = pyuv.Loop.default_loop()
+		self.nextLog   = 0.0
+		self.order     = 0                  # tie breaker, keeps the heap stable
+		self.queue     = []                 # heap of (time, order, handle, address, data)
+		self.running   = True
+		self.server    = (self.host, self.port)
+		self.signal_h  = pyuv.Signal(self.loop)
+		self.start     = time()
+		self.udpHandle = None               # type: pyuv.UDP, faces the clients
+		self.up        = Impairment('up', rng, *ups)
+
+	def Flush(self, now: float):
+		"""Deliver the datagrams whose time has come
+		"""
+		queue = self.queue
+		while queue and queue[0][0] <= now:
+			_, _, handle, address, data = heapq.heappop(queue)
+			handle.send(address, data)
+
+	def Forget(self, now: float):
+		for address, (handle, seen) in list(self.clients.items()):
+			if now - seen > PROXY_IDLE:
+				handle.close()
+				del self.clients[address]
+				logger.Info('Proxy.forget', address=address)
+
+	def Log(self, now: float):
+		if now < self.nextLog: return
+		self.nextLog = now + PROXY_LOG
+		self.Forget(now)
+		# copies: the log thread formats them later
+		logger.Info('Proxy.summary', clients=len(self.clients), queued=len(self.queue), up=dict(self.up.stats), down=dict(self.down.stats))
+
+	def Push(self, impairment: Impairment, handle: pyuv.UDP, address: Tuple[str, int], data: bytes, client: Tuple[str, int]):
+		now           = time()
+		times, action = impairment.Delays(now, len(data))
+		for when in times:
+			heapq.heappush(self.queue, (when, self.order, handle, address, data))
+			self.order += 1
+		if times:
+			impairment.stats['sent']  += len(times)
+			impairment.stats['bytes'] += len(data) * len(times)
+
+		if self.logFile:
+			delay = (times[0] - now) * 1000 if times else -1
+			self.logFile.write(f'{now - self.start:.4f},{impairment.name},{client[0]}:{client[1]},{len(data)},{action},{delay:.2f}\n')
+
+	def Signal(self, handle: pyuv.Signal, signum: int):
+		self.signal_h.close()
+		self.running = False
+
+	def UdpClientRead(self, handle: pyuv.UDP, address: Tuple[str, int], flags: int, data: bytes, error: int):
+		"""Client => server
+		"""
+		if data is None: return
+
+		if not (client := self.clients.get(address)):
+			upstream = pyuv.UDP(self.loop)
+			upstream.bind((self.host, 0))
+			upstream.start_recv(lambda _handle, _address, _flags, _data, _error, address=address: self.UdpServerRead(address, _data))
+			client = self.clients[address] = [upstream, 0.0]
+			logger.Info('Proxy.client', address=address)
+
+		client[1] = time()
+		self.Push(self.up, client[0], self.server, data, address)
+
+	def UdpServerRead(self, address: Tuple[str, int], data: bytes):
+		"""Server => client
+		"""
+		if data is None or address not in self.clients: return
+		self.Push(self.down, self.udpHandle, address, data, address)
+
+	# MAIN LOOP
+	###########
+
+	def Run(self):
+		self.udpHandle = pyuv.UDP(self.loop)
+		self.udpHandle.bind((self.host, self.proxy))
+		self.udpHandle.start_recv(self.UdpClientRead)
+
+		self.signal_h.start(self.Signal, signal.SIGINT)
+
+		if self.proxyLog:
+			self.logFile = open(self.proxyLog, 'w')
+			self.logFile.write('time,direction,client,size,action,delay_ms\n')
+
+		print(f'Proxy: {self.host}:{self.proxy} => {self.server[0]}:{self.server[1]}')
+		while self.running:
+			self.loop.run(pyuv.UV_RUN_NOWAIT)
+			now = time()
+			self.Flush(now)
+			self.Log(now)
+			sleep(PROXY_SLEEP)
+
+		for handle, _ in self.clients.values(): handle.close()
+		self.udpHandle.close()
+		if self.logFile: self.logFile.close()
+		self.nextLog = 0
+		self.Log(time())
+
+
+def MainProxy(**kwargs):
+	print(f'Proxy: pyuv={pyuv.__version__}')
+	proxy = PongProxy(**kwargs)
+	proxy.Run()
+	print('Goodbye.')
+
+
+if __name__ == '__main__':
+	MainProxy()
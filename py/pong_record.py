@@ -0,0 +1,241 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Pong record
+- the server appends what it shares with the clients, once per tick, to a binary file
+- the messages formatted for the network are reused, recording formats nothing more
+- records: header (time, physics frame, size, kind) + payload, balls and paddles use their network codecs
+- 'K' keyframe: layout + bot paddles + walls + all balls + all paddles, every RECORD_KEYFRAME sec,
+  on NewGame and when a player joins or leaves
+- 'T' tick: dirty balls + dirty paddles (with their buttons = inputs) + damaged walls
+- replay: physics runs between the records, with the recorded buttons of the bot paddles, at any speed
+"""
+
+import struct
+from time import sleep, time
+
+from common import DefaultFloat
+from pong_common import Ball, Paddle, PHYSICS_FPS, Pong
+
+KEYFRAME_FMT    = 'BHBB'                    # numDiv, balls, walls, bots
+RECORD_KEYFRAME = 5.0                       # sec between keyframes
+RECORD_MAGIC    = b'BPR1'
+TICK_FMT        = 'HBB'                     # balls, paddles, walls
+
+
+class RecordHeader:
+	structFmt  = 'fIIB'                     # time since the start, physics frame, payload size, kind
+	structSize = struct.calcsize(structFmt)
+
+
+class Recorder:
+	"""Append-only match log, written by the server
+	"""
+	def __init__(self, filename: str):
+		self.balls     = []                 # Ball messages shared this tick
+		self.file      = open(filename, 'wb')
+		self.frameBase = 0                  # physics frames before the current game
+		self.lastDone  = 0                  # pong.doneFrame at the previous record
+		self.nextKey   = 0.0                # time of the next keyframe
+		self.paddles   = []                 # Paddle messages shared this tick
+		self.start     = time()
+		self.walls     = []                 # (wall id, health) shared this tick
+
+		self.file.write(RECORD_MAGIC)
+
+	def Close(self):
+		if self.file:
+			self.file.close()
+			self.file = None
+
+	def Keyframe(self, pong: Pong, bots: int):
+		"""Whole state, so a replay can start or seek there
+		:param bots: paddles driven by their buttons on the server (flag)
+		"""
+		self.balls.clear()
+		self.paddles.clear()
+		self.walls.clear()
+
+		now          = time() - self.start
+		self.nextKey = now + RECORD_KEYFRAME
+		self.Write(pong, now, b'K', b''.join([
+			struct.pack(KEYFRAME_FMT, pong.numDiv, len(pong.balls), len(pong.walls), bots),
+			bytes(pong.walls),
+			*(ball.Format() for ball in pong.balls),
+			*(paddle.Format() for paddle in pong.paddles),
+		]))
+
+	def Tick(self, pong: Pong, bots: int):
+		"""Write what was shared during the tick, call it after ShareDirty
+		"""
+		balls   = self.balls
+		paddles = self.paddles
+		walls   = self.walls
+		# the server loop spins => most ticks have nothing new
+		if not (balls or paddles or walls): return
+
+		now = time() - self.start
+		if now >= self.nextKey:
+			self.Keyframe(pong, bots)
+			return
+
+		self.Write(pong, now, b'T', b''.join([
+			struct.pack(TICK_FMT, len(balls), len(paddles), len(walls)),
+			*balls,
+			*paddles,
+			*(struct.pack('BB', wid, health) for wid, health in walls),
+		]))
+		balls.clear()
+		paddles.clear()
+		walls.clear()
+
+	def Write(self, pong: Pong, now: float, kind: bytes, payload: bytes):
+		# NewGame restarts doneFrame
+		if pong.doneFrame < self.lastDone: self.frameBase += self.lastDone
+		self.lastDone = pong.doneFrame
+
+		frame = self.frameBase + pong.doneFrame
+		self.file.write(struct.pack(RecordHeader.structFmt, now, frame, len(payload), kind[0]) + payload)
+
+
+class Replay:
+	"""Feed a record back into a Pong, headless or rendered
+	"""
+	def __init__(self, filename: str):
+		with open(filename, 'rb') as file:
+			data = file.read()
+
+		if data[:len(RECORD_MAGIC)] != RECORD_MAGIC: raise ValueError(f'Replay: not a record: {filename}')
+
+		self.bots      = 0                  # paddles driven by their buttons (flag)
+		self.done      = 0                  # physics frames done since the start
+		self.duration  = 0.0
+		self.index     = 0                  # next record
+		self.keyframes = []                 # [record index], for Seek
+		self.maxBall   = 1                  # the replaying Pong needs a pool that large
+		self.records   = []                 # type: List[Tuple[float, int, int, bytes]], (time, frame, kind, payload)
+
+		offset = len(RECORD_MAGIC)
+		size   = len(data)
+		while offset + RecordHeader.structSize <= size:
+			now, frame, length, kind = struct.unpack_from(RecordHeader.structFmt, data, offset)
+			offset += RecordHeader.structSize
+			if offset + length > size: break
+
+			if kind == ord('K'):
+				self.keyframes.append(len(self.records))
+				self.maxBall = max(self.maxBall, struct.unpack_from(KEYFRAME_FMT, data, offset)[1])
+			else:
+				start = offset + struct.calcsize(TICK_FMT)
+				for i in range(struct.unpack_from(TICK_FMT, data, offset)[0]):
+					self.maxBall = max(self.maxBall, struct.unpack_from(Ball.idFmt, data, start + i * Ball.structSize)[1] + 1)
+			self.records.append((now, frame, kind, data[offset: offset + length]))
+			self.duration = now
+			offset       += length
+
+	def Advance(self, pong: Pong, until: float) -> bool:
+		"""Run physics + apply the records up to a time
+		:return: False at the end of the record
+		"""
+		for ball in pong.balls: ball.flag = 0
+		pong.dirtyBall.clear()
+		pong.dirtyPaddle = 0
+		pong.dirtyWall   = 0
+		pong.hitFlag     = 0
+
+		records = self.records
+		numRec  = len(records)
+		while self.index < numRec and records[self.index][0] <= until:
+			_, frame, kind, payload = records[self.index]
+			self.Step(pong, frame)
+			self.Apply(pong, kind, payload, frame)
+			self.index += 1
+
+		# between 2 records: extrapolate the frame from the time
+		if self.index and self.index < numRec:
+			now, frame, _, _ = records[self.index - 1]
+			self.Step(pong, min(frame + int((until - now) * PHYSICS_FPS), records[self.index][1]))
+
+		pong.Interpolate(False)
+		return self.index < numRec
+
+	def Apply(self, pong: Pong, kind: int, payload: bytes, frame: int):
+		if kind == ord('K'):
+			numDiv, numBall, numWall, self.bots = struct.unpack_from(KEYFRAME_FMT, payload)
+			offset                              = struct.calcsize(KEYFRAME_FMT)
+			if numDiv != pong.numDiv: pong.NewGame(numDiv)
+			pong.SetBalls(numBall)
+			pong.walls[:numWall] = payload[offset: offset + numWall]
+			offset              += numWall
+			numPaddle            = len(pong.paddles)
+			self.done            = frame
+		else:
+			numBall, numPaddle, numWall = struct.unpack_from(TICK_FMT, payload)
+			offset                      = struct.calcsize(TICK_FMT)
+
+		for _ in range(numBall):
+			message = payload[offset: offset + Ball.structSize]
+			bid     = Ball.Id(message)
+			if bid >= len(pong.balls): pong.SetBalls(bid + 1)
+			if bid < len(pong.balls):
+				pong.balls[bid].Parse(message)
+				pong.dirtyBall.add(bid)
+				pong.dirtyPath.add(bid)
+			offset += Ball.structSize
+
+		for _ in range(numPaddle):
+			message = payload[offset: offset + Paddle.structSize]
+			if (pid := message[1]) < len(pong.paddles): pong.paddles[pid].Parse(message)
+			offset += Paddle.structSize
+
+		if kind == ord('K'):
+			for pid in range(len(pong.paddles)): pong.CalculateHealth(pid, False)
+		else:
+			for wid, health in struct.iter_unpack('BB', payload[offset: offset + numWall * 2]):
+				if wid < len(pong.walls):
+					pong.walls[wid]  = health
+					pong.dirtyWall  |= 1 << wid
+					pong.CalculateHealth(wid // pong.numDiv, False)
+
+	def Seek(self, pong: Pong, until: float):
+		"""Restart from the last keyframe before a time
+		"""
+		index = 0
+		for key in self.keyframes:
+			if self.records[key][0] > until: break
+			index = key
+
+		self.index = index
+		self.done  = self.records[index][1] if self.records else 0
+		self.Advance(pong, until)
+
+	def Step(self, pong: Pong, want: int):
+		"""Physics up to a frame, with the recorded buttons, the other paddles come from their own records
+		"""
+		bots = [paddle for pid, paddle in enumerate(pong.paddles) if self.bots & (1 << pid)]
+		while self.done < want:
+			for paddle in bots:
+				if paddle.alive: pong.ControlPaddle(paddle, paddle.buttons)
+			Pong.Physics(pong)
+			self.done += 1
+
+
+def MainReplay(**kwargs):
+	"""Headless replay, at --speed x real time, 0 = as fast as possible
+	"""
+	speed  = DefaultFloat(kwargs.get('speed'), 1.0)
+	replay = Replay(str(kwargs.get('replay')))
+	pong   = Pong(ball_pool=replay.maxBall)
+
+	print(f'Replay: records={len(replay.records)} keyframes={len(replay.keyframes)} duration={replay.duration:.1f}s')
+
+	start = time()
+	while True:
+		until = min((time() - start) * speed, replay.duration) if speed > 0 else replay.duration
+		if not replay.Advance(pong, until): break
+		if speed > 0: sleep(1 / PHYSICS_FPS)
+
+	elapsed = time() - start
+	print(f'Replay: frames={replay.done} elapsed={elapsed:.2f}s speed={replay.duration / max(elapsed, 1e-6):.1f}x')
@@ -6,30 +6,53 @@
 Pong server
 """
 
-from itertools import chain
+import json
 from math import sqrt
 import signal
 import struct
 from time import time
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 
 import pyuv
 
-from pong_common import Ball, Body, Paddle, Pong, TIMEOUT_DISCONNECT, TIMEOUT_PING, UdpHeader
+from common import DefaultFloat, DefaultInt
+from log import LOG_DEBUG, logger
+from pong_ai import PongAI
+from pong_capture import Capture
+from pong_common import Ball, Body, CHECKSUM_BALLS, CHECKSUM_FIX, CHECKSUM_FMT, CHECKSUM_FRAMES, CHECKSUM_GROUP, Paddle, Pong, \
+	SNAPSHOT_PART, SNAPSHOT_RESEND, TIMEOUT_DISCONNECT, TIMEOUT_PING, UDP_PAYLOAD, UdpHeader
+from pong_record import Recorder
+from profiler import ExportStats, Profiler
 
 
 class PongServer(Pong):
 	def __init__(self, **kwargs):
 		super(PongServer, self).__init__(**kwargs)
-		print('PongServer', kwargs)
-
-		self.connId    = 0
-		self.id        = 0
-		self.players   = {}
-		self.running   = True
-		self.serverTcp = None                               # type: pyuv.TCP
-		self.serverUdp = None                               # type: pyuv.UDP
-		self.slots     = [None, None, None, None]
+		logger.Info('PongServer', **kwargs)
+
+		# options
+		self.bots       = DefaultInt(kwargs.get('bots'), 1)
+		self.capture    = kwargs.get('capture') or ''
+		self.difficulty = DefaultFloat(kwargs.get('difficulty'), 0.7)
+		self.profile    = kwargs.get('profile') or ''
+		self.record     = kwargs.get('record') or ''
+
+		self.ai          = PongAI(self, self.difficulty)
+		self.capturer    = None                             # type: Capture
+		self.checkFrame  = 0                                # doneFrame of the next checksums
+		self.connId      = 0
+		self.corrected   = set()                            # addresses answered by Correct this tick
+		self.corrections = 0                                # groups resent after a checksum mismatch
+		self.id          = 0
+		self.players     = {}                               # address => [slot, recvTime, pingTime, seqRecv, snapId]
+		self.profiler    = Profiler()                       # tick stages, for /status
+		self.recorder    = None                             # type: Recorder
+		self.running     = True
+		self.serverTcp   = None                             # type: pyuv.TCP
+		self.serverUdp   = None                             # type: pyuv.UDP
+		self.slots       = [None, None, None, None]
+		self.snapshots   = {}                               # address => [snapshot id, sent time], not acknowledged yet
+		self.spectators  = []                               # addresses beyond the slots, they get the world updates too
 
 		self.loop      = pyuv.Loop.default_loop()
 		self.signal_h  = pyuv.Signal(self.loop)
@@ -40,11 +63,32 @@ class PongServer(Pong):
 	def AddPlayer(self, address: Tuple[str, int], wantSlot: int) -> int:
 		slot = self.FindSlot(wantSlot)
 		if slot < len(self.slots): self.slots[slot] = address
-		self.players[address] = [slot, time(), time()]
-		print('AddPlayer: players=')
+		elif address not in self.spectators: self.spectators.append(address)
+		self.players[address] = [slot, time(), time(), -1, 0]
+		logger.Info('AddPlayer', address=address, slot=slot)
 		self.PrintPlayers()
+		if self.recorder: self.recorder.Keyframe(self, self.BotFlag())
 		return slot
 
+	def BotFlag(self) -> int:
+		"""Paddles played by the server bots
+		"""
+		if not self.bots: return 0
+		return sum(1 << sid for sid, slot in enumerate(self.slots) if not slot)
+
+	def BotControls(self):
+		"""Server bots play in the empty slots, their paddles are authoritative
+		"""
+		if not self.bots: return
+
+		# called even when no slot is empty, so the AI keeps its frame count
+		ids = [sid for sid, slot in enumerate(self.slots) if not slot and self.paddles[sid].alive]
+		for sid, pad in zip(ids, self.ai.Controls(ids).tolist()):
+			# released buttons are shared too, recordings replay the buttons
+			paddle  = self.paddles[sid]
+			changed = paddle.buttons != pad
+			if self.ControlPaddle(paddle, pad) or changed: self.dirtyPaddle |= (1 << sid)
+
 	def CheckPlayers(self):
 		now     = time()
 		removes = set()
@@ -56,20 +100,53 @@ class PongServer(Pong):
 				self.Send(address, b'p')
 				player[2] = now
 
+		# lost fragment or acknowledgement => the world has moved on, send it again
+		for address, (_, sent) in list(self.snapshots.items()):
+			if now > sent + SNAPSHOT_RESEND and address not in removes and (player := self.players.get(address)):
+				self.SendSnapshot(address, player[0])
+
 		if removes:
 			for remove in removes: self.DeletePlayer(remove, False)
 			self.PrintPlayers()
 
+	def Correct(self, address: Tuple[str, int], pid: int, groups: bytes):
+		"""Resend the checksum groups that differ on a peer, except the objects it drives
+		- one answer per peer per tick, unique groups, CHECKSUM_FIX at most => a request can't be amplified
+		- all the walls go in a single 'V' datagram
+		"""
+		if address in self.corrected: return
+		self.corrected.add(address)
+
+		numBall  = len(self.balls)
+		numGroup = CHECKSUM_BALLS + (numBall + CHECKSUM_GROUP - 1) // CHECKSUM_GROUP
+		groups   = sorted({group for group in groups if group < numGroup})[:CHECKSUM_FIX]
+		bids     = []
+		for group in groups:
+			if group == 0:
+				self.Send(address, struct.pack('BB', ord('V'), len(self.walls)) + bytes(self.walls))
+			elif group < CHECKSUM_BALLS:
+				if group - 1 != pid: self.Send(address, self.paddles[group - 1].Format())
+			else:
+				start = (group - CHECKSUM_BALLS) * CHECKSUM_GROUP
+				bids += [bid for bid in range(start, min(start + CHECKSUM_GROUP, numBall)) if self.balls[bid].parentId != pid]
+
+		if bids: self.ShareBalls(bids, address)
+		self.corrections += len(groups)
+
 	def DeletePlayer(self, address: Tuple[str, int], log: bool = True):
 		if player := self.players.get(address):
-			self.slots[player[0]] = None
+			if player[0] < len(self.slots): self.slots[player[0]] = None
+			elif address in self.spectators: self.spectators.remove(address)
 			del self.players[address]
-			print(f'DeletePlayer: {address}')
+			self.snapshots.pop(address, None)
+			self.corrected.discard(address)
+			logger.Info('DeletePlayer', address=address)
 			if log: self.PrintPlayers()
+			if self.recorder: self.recorder.Keyframe(self, self.BotFlag())
 
 	def FindSlot(self, wantSlot: int) -> int:
 		numSlot = len(self.slots)
-		if 0 <= wantSlot <= numSlot and not self.slots[wantSlot]: return wantSlot
+		if 0 <= wantSlot < numSlot and not self.slots[wantSlot]: return wantSlot
 
 		for i, slot in enumerate(self.slots):
 			if not slot: return i
@@ -77,27 +154,111 @@ class PongServer(Pong):
 		return numSlot
 
 	def PrintPlayers(self):
-		print('slots=', self.slots)
-		for key, value in self.players.items():
-			print(' ', key, value)
+		# copies: the log thread formats them later
+		logger.Info('players', slots=list(self.slots), players={f'{address[0]}:{address[1]}': list(player) for address, player in self.players.items()})
+
+	def Receivers(self) -> List[Tuple[str, int]]:
+		"""Addresses getting the world updates: players in the slots, then spectators
+		"""
+		return [slot for slot in self.slots if slot] + self.spectators
 
 	# NETWORK
 	#########
 
+	def SendSnapshot(self, address: Tuple[str, int], pid: int):
+		"""Whole world in fragments of one datagram each, resent until the peer acknowledges it with 's'
+		"""
+		if not (player := self.players.get(address)): return
+
+		# ids per peer: a global counter would wrap between 2 snapshots of the same peer when many join
+		payload = self.FormatSnapshot(pid)
+		size    = UDP_PAYLOAD - UdpHeader.structSize - struct.calcsize(SNAPSHOT_PART)
+		parts   = [payload[start: start + size] for start in range(0, len(payload), size)]
+		snapId  = player[4] = (player[4] + 1) % 256
+
+		for index, part in enumerate(parts):
+			self.Send(address, struct.pack(SNAPSHOT_PART, ord('S'), snapId, index, len(parts)) + part)
+		self.snapshots[address] = [snapId, time()]
+
+	def ShareBalls(self, ids: Iterable[int] or None, address: Tuple[str, int] = None):
+		"""Batched ball update, each ball is formatted once then packed into 'M' datagrams
+		:param ids: ball ids, None for all balls
+		:param address: send only to this address, otherwise to all players and spectators
+		"""
+		numBall = len(self.balls)
+		balls   = self.balls if ids is None else [self.balls[bid] for bid in ids if bid < numBall]
+		if not balls: return
+
+		records = [(ball.parentId, ball.Format()) for ball in balls]
+
+		if address:
+			for message in self.ballBatch.Format([record for _, record in records]): self.Send(address, message)
+			return
+
+		if self.recorder: self.recorder.balls.extend(record for _, record in records)
+
+		for sid, slot in enumerate(self.slots):
+			if slot:
+				for message in self.ballBatch.Format([record for parentId, record in records if parentId != sid]):
+					self.Send(slot, message)
+
+		# spectators drive no ball => one batch for all of them
+		if self.spectators:
+			messages = self.ballBatch.Format([record for _, record in records])
+			for address in self.spectators:
+				for message in messages: self.Send(address, message)
+
+	def ShareChecksums(self):
+		"""Hashes of the world, after the updates of the same tick, the peers answer 'h' with the groups that differ
+		"""
+		numBall = len(self.balls)
+		sums    = self.Checksums(numBall)
+		message = struct.pack(f'{CHECKSUM_FMT}{len(sums)}I', ord('H'), numBall, *sums)
+		for address in self.Receivers(): self.Send(address, message)
+
+		self.checkFrame = self.doneFrame + CHECKSUM_FRAMES
+
+	def ShareDirty(self):
+		self.corrected.clear()
+		if self.dirtyBall:   self.ShareBalls(self.dirtyBall)
+		if self.dirtyPaddle: self.ShareObjects(self.paddles, self.dirtyPaddle)
+		if self.dirtyWall:   self.ShareWalls(self.dirtyWall)
+		if self.doneFrame >= self.checkFrame: self.ShareChecksums()
+
 	def ShareObjects(self, objects: List[Body], flag: int, skipId: int = -1):
 		for oid, obj in enumerate(objects):
 			if flag == -1 or (flag & (1 << oid)):
 				message = obj.Format()
+				if self.recorder: self.recorder.paddles.append(message)
 				for sid, slot in enumerate(self.slots):
 					if slot and sid != skipId and obj.parentId != sid:
 						self.Send(slot, message)
+				for address in self.spectators: self.Send(address, message)
 
 	def ShareWalls(self, flag: int):
 		for id, wall in enumerate(self.walls):
 			if flag == -1 or (flag & (1 << id)):
 				message = struct.pack('BBB', ord('W'), id, wall)
-				for slot in self.slots:
-					if slot: self.Send(slot, message)
+				if self.recorder: self.recorder.walls.append((id, wall))
+				for address in self.Receivers(): self.Send(address, message)
+
+	def Status(self) -> dict:
+		"""Server health, for the load tester
+		"""
+		numSlot = len(self.slots)
+		stages  = self.profiler.Stats()
+		return {
+			'balls': len(self.balls),
+			'bytesRecv': self.bytesRecv,
+			'bytesSent': self.bytesSent,
+			'corrections': self.corrections,
+			'packetsRecv': self.packetsRecv,
+			'packetsSent': self.packetsSent,
+			'players': sum(1 for player in self.players.values() if player[0] < numSlot),
+			'spectators': sum(1 for player in self.players.values() if player[0] >= numSlot),
+			'stages': stages,
+			'tickMs': stages.get('tick', {}),
+		}
 
 	def Signal(self, handle: pyuv.Signal, signum: int):
 		for client in self.players:
@@ -128,7 +289,20 @@ class PongServer(Pong):
 		if data is None: return
 
 		while len(data):
-			if data[0: 5] == b'GET /':
+			if data[0: 12] == b'GET /status ':
+				body = json.dumps(self.Status())
+				client.write('\r\n'.join([
+					'HTTP/1.1 200 OK',
+					'Server: Custom/1.0.0',
+					f'Content-Length: {len(body)}',
+					'Content-Type: application/json',
+					'Connection: close',
+					'',
+					body,
+				]).encode())
+				break
+
+			elif data[0: 5] == b'GET /':
 				i = 5
 				size = len(data)
 				while i < size:
@@ -165,34 +339,40 @@ class PongServer(Pong):
 				])
 				client.write(response.encode())
 			else:
-				print(f'TcpServerRead:', data)
+				logger.Warning('TcpServerRead.unknown', data=data[:64])
 				break
 
 	def UdpOnRead(self, handle: pyuv.UDP, address: Tuple[str, int], flags: int, data: bytes, error: int):
 		if data is None: return
+		if self.capturer: self.capturer.Write(address, data)
 
-		seq = self.udpHeader.Parse(data[:UdpHeader.structSize])
-		if seq < self.seqRecv and (self.seqRecv < 64512 or seq > 1024):
-			print('seq=', seq, '<', self.seqRecv)
-		else:
-			self.seqRcv = seq
+		self.bytesRecv   += len(data)
+		self.packetsRecv += 1
 
+		seq  = self.udpHeader.Parse(data[:UdpHeader.structSize])
 		data = data[UdpHeader.structSize:]
 
 		player = self.players.get(address)
 		if player:
 			pid       = player[0]
 			player[1] = time()
+
+			# sequences are numbered per peer
+			if player[3] >= 0 and (seq - player[3]) % 65536 >= 32768:
+				if logger.level <= LOG_DEBUG: logger.Debug('UdpOnRead.stale', address=address, seq=seq, last=player[3])
+			else:
+				player[3] = seq
 		else:
 			pid = -1
 
 		# 1) game
 		# ball
 		if data[0] == ord('B'):
-			bid = data[1]
+			bid = Ball.Id(data)
 			if 0 <= bid < len(self.balls):
 				self.balls[bid].Parse(data[:Ball.structSize])
-				self.dirtyBall |= (1 << bid)
+				self.dirtyBall.add(bid)
+				self.dirtyPath.add(bid)
 
 		# paddle
 		elif data[0] == ord('P'):
@@ -205,17 +385,20 @@ class PongServer(Pong):
 		# 2) connection
 		elif data[0] == ord('p'): self.Send(address, b'q')
 		elif data[0] == ord('q'):
-			print('pong!', pid, address, player)
+			if logger.level <= LOG_DEBUG: logger.Debug('UdpOnRead.pong', pid=pid, address=address)
+
+		elif data[0] == ord('h'):
+			if player: self.Correct(address, pid, data[1:])
 
 		elif data[0] == ord('I'):
 			wantSlot = data[1]
 			if pid < 0: pid = self.AddPlayer(address, wantSlot)
-			self.Send(address, struct.pack('BB', ord('I'), pid))
+			self.SendSnapshot(address, pid)
 
-			for obj in chain(self.balls, self.paddles): self.Send(address, obj.Format())
-			for id, wall in enumerate(self.walls): self.Send(address, struct.pack('BBB', ord('W'), id, wall))
+		elif data[0] == ord('s'):
+			if (snapshot := self.snapshots.get(address)) and snapshot[0] == data[1]: del self.snapshots[address]
 		else:
-			print(f'UdpOnRead_{pid}:', data)
+			logger.Warning('UdpOnRead.unknown', pid=pid, address=address, data=data[:32])
 
 	# GAME
 	######
@@ -227,10 +410,18 @@ class PongServer(Pong):
 			if slot and (player := self.players.get(slot)):
 				player[0] = 1
 
-		self.ShareObjects(self.balls, -1)
+		self.ShareBalls(None)
 		self.ShareObjects(self.paddles, -1)
 		self.ShareWalls(-1)
 
+		# doneFrame restarted
+		self.checkFrame = CHECKSUM_FRAMES
+		if self.recorder: self.recorder.Keyframe(self, self.BotFlag())
+
+	def Physics(self):
+		self.BotControls()
+		super(PongServer, self).Physics()
+
 	# MAIN LOOP
 	###########
 
@@ -241,23 +432,36 @@ class PongServer(Pong):
 		self.serverTcp.listen(self.TcpListen)
 
 		self.udpHandle = pyuv.UDP(self.loop)
-		self.udpHandle.bind(('127.0.0.1', 9000))
+		self.udpHandle.bind((self.host, self.port))
 		self.udpHandle.start_recv(self.UdpOnRead)
 
 		self.signal_h.start(self.Signal, signal.SIGINT)
 
+		if self.capture: self.capturer = Capture(self.capture)
+		if self.record: self.recorder = Recorder(self.record)
+
 		self.NewGame()
-		self.AddBall(1)
+		self.SetBalls(self.chaos or 2)
 
+		profiler = self.profiler
 		while self.running:
+			profiler.Start()
 			self.PhysicsLoop()
+			profiler.Lap('physics')
 			self.loop.run(pyuv.UV_RUN_NOWAIT)
-
-			if self.dirtyBall:   self.ShareObjects(self.balls, self.dirtyBall)
-			if self.dirtyPaddle: self.ShareObjects(self.paddles, self.dirtyPaddle)
-			if self.dirtyWall:   self.ShareWalls(self.dirtyWall)
-
+			profiler.Lap('uv')
+			self.ShareDirty()
+			profiler.Lap('share')
+			if self.recorder:
+				self.recorder.Tick(self, self.BotFlag())
+				profiler.Lap('record')
 			self.CheckPlayers()
+			profiler.Lap('players')
+			profiler.End('tick')
+
+		if self.capturer: self.capturer.Close()
+		if self.recorder: self.recorder.Close()
+		if self.profile: ExportStats(self.profile, self.Status())
 
 
 def MainServer(**kwargs):
@@ -0,0 +1,76 @@
+# coding: utf-8
+# @author octopoulo <polluxyz@gmail.com>
+# @version 2026-10-19
+
+"""
+Profiler
+- always on: one perf_counter + one deque append per stage
+- rolling window per stage, the percentiles are only computed when asked for
+"""
+
+from collections import deque
+import json
+from time import perf_counter
+from typing import Dict, List
+
+PROFILE_FRAMES = 1000                       # rolling window, per stage
+
+
+class Profiler:
+	def __init__(self, size: int = PROFILE_FRAMES):
+		self.last   = perf_counter()        # end of the previous stage
+		self.size   = size
+		self.stages = {}                    # name => deque of durations, in seconds, in insertion order
+		self.start  = self.last             # beginning of the frame
+
+	def Add(self, name: str, duration: float):
+		if (times := self.stages.get(name)) is None:
+			times = self.stages[name] = deque(maxlen=self.size)
+		times.append(duration)
+
+	def End(self, name: str = 'frame'):
+		"""Whole frame, since Start
+		"""
+		self.Add(name, perf_counter() - self.start)
+
+	def Lap(self, name: str):
+		"""Stage = time since the previous Lap or Start
+		"""
+		now = perf_counter()
+		self.Add(name, now - self.last)
+		self.last = now
+
+	def Lines(self) -> List[str]:
+		"""Overlay text, in ms
+		"""
+		return [
+			f'{name}: {stat["p50"]:.2f} {stat["p95"]:.2f} {stat["max"]:.2f}'
+			for name, stat in self.Stats().items()
+		]
+
+	def Start(self):
+		self.start = self.last = perf_counter()
+
+	def Stats(self) -> Dict[str, dict]:
+		"""Rolling percentiles per stage, in ms
+		"""
+		stats = {}
+		for name, times in self.stages.items():
+			if not (num := len(times)): continue
+			values = sorted(times)
+			stats[name] = {
+				'mean': sum(values) / num * 1000,
+				'p50': values[num * 50 // 100] * 1000,
+				'p95': values[num * 95 // 100] * 1000,
+				'p99': values[num * 99 // 100] * 1000,
+				'max': values[-1] * 1000,
+				'frames': num,
+			}
+
+		return stats
+
+
+def ExportStats(filename: str, stats: dict):
+	with open(filename, 'w') as file:
+		json.dump(stats, file, indent=2)
+	print(f'ExportStats: {filename}')
@@ -4,22 +4,136 @@
 
 """
 Renderer
+- per-primitive Draw* calls, and batched Draw*s calls taking arrays in screen coordinates
+- ToScreen converts world coordinates in one vectorized step
 """
 
-from typing import Tuple
+from typing import List, Tuple
+
+import numpy as np
+import pygame
 
 
 class Renderer:
 	def __init__(self, **kwargs):
 		print('Renderer')
-		self.name = 'null'
+		self.flags  = 0                     # extra pygame.display.set_mode flags
+		self.name   = 'null'
+		self.offset = np.zeros(2)           # world => screen
+		self.scale  = np.ones(2)
 		self.screen = None
+		self.size   = (0, 0)
+
+	def BeginLayer(self):
+		"""Following Draw* calls go to the cached arena layer, until EndLayer
+		- the layer keeps its content, so only what changed must be drawn again
+		"""
+		pass
+
+	def Clear(self, color: Tuple[int, int, int]):
+		pass
 
 	def DrawCircle(self, x: float, y: float, radius: float, alpha: float, color: Tuple[int, int, int], drawLine: bool):
 		pass
 
+	def DrawCircles(self, centers: np.ndarray, radii: np.ndarray, angles: np.ndarray, colors: np.ndarray, drawLine: bool):
+		"""Batched DrawCircle, the fallback loops
+		:param centers: (N, 2)
+		:param radii: (N,) or scalar
+		:param angles: (N,) or scalar
+		:param colors: (N, 3) or (3,)
+		"""
+		num = len(centers)
+		for (x, y), radius, alpha, color in zip(
+				centers.tolist(),
+				np.broadcast_to(radii, num).tolist(),
+				np.broadcast_to(angles, num).tolist(),
+				np.broadcast_to(colors, (num, 3)).tolist()):
+			self.DrawCircle(x, y, radius, alpha, color, drawLine)
+
+	def DrawLayer(self):
+		"""Draw the arena layer as the frame background, instead of Clear
+		"""
+		pass
+
 	def DrawLine(self, x: float, y: float, x2: float, y2: float, color: Tuple[int, int, int], width: int):
 		pass
 
+	def DrawLines(self, starts: np.ndarray, ends: np.ndarray, colors: np.ndarray, widths: np.ndarray):
+		"""Batched DrawLine
+		:param starts: (N, 2)
+		:param ends: (N, 2)
+		:param colors: (N, 3) or (3,)
+		:param widths: (N,) or scalar
+		"""
+		num = len(starts)
+		for (x, y), (x2, y2), color, width in zip(
+				starts.tolist(),
+				ends.tolist(),
+				np.broadcast_to(colors, (num, 3)).tolist(),
+				np.broadcast_to(widths, num).tolist()):
+			self.DrawLine(x, y, x2, y2, color, width)
+
 	def DrawQuad(self, x: float, y: float, rx: float, ry: float, alpha: float, color: Tuple[int, int, int]):
 		pass
+
+	def DrawQuads(self, centers: np.ndarray, halves: np.ndarray, angles: np.ndarray, colors: np.ndarray):
+		"""Batched DrawQuad
+		:param centers: (N, 2)
+		:param halves: (N, 2) or (2,), half sizes
+		:param angles: (N,) or scalar
+		:param colors: (N, 3) or (3,)
+		"""
+		num = len(centers)
+		for (x, y), (rx, ry), alpha, color in zip(
+				centers.tolist(),
+				np.broadcast_to(halves, (num, 2)).tolist(),
+				np.broadcast_to(angles, num).tolist(),
+				np.broadcast_to(colors, (num, 3)).tolist()):
+			self.DrawQuad(x, y, rx, ry, alpha, color)
+
+	def DrawSurface(self, surface, x: float, y: float):
+		"""Draw a pygame surface, top-left at (x, y), ex: text
+		"""
+		pass
+
+	def DrawSurfaces(self, blits: List[Tuple[object, Tuple[float, float]]]):
+		"""Batched DrawSurface
+		:param blits: [(surface, (x, y))], same as Surface.blits
+		"""
+		for surface, (x, y) in blits: self.DrawSurface(surface, x, y)
+
+	def EndLayer(self):
+		pass
+
+	def Flush(self):
+		"""Submit what was queued this frame, called before display.flip
+		"""
+		pass
+
+	def Init(self, screen):
+		"""Called once the display was created
+		"""
+		self.screen = screen
+		self.size   = screen.get_size()
+
+	def Present(self):
+		"""Show the frame
+		"""
+		pygame.display.flip()
+
+	def SetClip(self, rect: Tuple[int, int, int, int] or None):
+		"""Restrict drawing to (x, y, width, height), None to draw everywhere
+		"""
+		pass
+
+	def SetView(self, scale: float, offset: float):
+		"""World => screen: x * scale + offset, -y * scale + offset
+		"""
+		self.offset = np.array([offset, offset], dtype=np.float64)
+		self.scale  = np.array([scale, -scale], dtype=np.float64)
+
+	def ToScreen(self, points: np.ndarray) -> np.ndarray:
+		"""Convert (N, 2) world points to screen points
+		"""
+		return points * self.scale + self.offset
@@ -4,28 +4,92 @@
 
 """
 Renderer Basic
+- balls and paddles from the batch calls are pre-rendered sprites, keyed by color, size and quantized angle
+- all sprites of a frame are drawn with a single Surface.blits in Flush
+- the arena layer is a screen-sized surface, Draw* calls go to self.target
+- dirty mode: restore the layer under what was drawn last frame, present only the rects that changed
 """
 
-from math import cos, sin
-from typing import Tuple
+from collections import OrderedDict
+from math import ceil, cos, pi, sin
+from typing import List, Tuple
 
+import numpy as np
 import pygame
 
+from common import DefaultInt
 from renderer import Renderer
 
 
+SPRITE_ANGLES = 256                         # angle quantization, per turn
+SPRITE_CACHE  = 2048                        # max sprites, the least recently used are evicted
+SPRITE_KEY    = (1, 2, 3)                   # transparent color, RLE colorkey blits faster than per-pixel alpha
+
+
 class RendererBasic(Renderer):
 	def __init__(self, **kwargs):
 		super(RendererBasic, self).__init__(**kwargs)
 		print('RendererBasic')
 		self.name = 'basic'
 
+		# options
+		self.dirty = DefaultInt(kwargs.get('dirty'), 0)
+
+		self.blits      = []                # [(sprite, (x, y))], drawn in Flush
+		self.drawn      = []                # [(key, rect)] drawn on the screen this frame, key=None => always changed
+		self.drawnPrev  = []                # same, previous frame
+		self.full       = True              # next Present must update the whole screen
+		self.layer      = None              # type: pygame.Surface
+		self.layerRects = []                # layer parts redrawn since the last DrawLayer
+		self.sprites    = OrderedDict()     # (kind, color, size, angle step, ...) => (surface, (halfX, halfY))
+		self.target     = None              # type: pygame.Surface, screen or layer
+
+	def BeginLayer(self):
+		self.Flush()
+		self.target = self.layer
+
+	def Blits(self, blits: List[Tuple[pygame.Surface, Tuple[float, float]]]):
+		if not self.dirty or self.target is not self.screen:
+			self.target.blits(blits, doreturn=False)
+			return
+
+		# same surface at the same place as last frame => its pixels did not change
+		rects = self.target.blits(blits)
+		self.drawn.extend(((id(surface), dest), rect) for (surface, dest), rect in zip(blits, rects))
+
+	def Clear(self, color: Tuple[int, int, int]):
+		self.target.fill(color)
+		self.full = True
+
 	def DrawCircle(self, x: float, y: float, radius: float, alpha: float, color: Tuple[int, int, int], drawLine: bool):
-		pygame.draw.circle(self.screen, color, (x, y), radius)
+		self.Track(pygame.draw.circle(self.target, color, (x, y), radius))
 		if drawLine: self.DrawLine(x, y, x + radius * cos(alpha), y + radius * sin(alpha), (255 - color[0], 255 - color[1], 255 - color[2]), 2)
 
+	def DrawCircles(self, centers: np.ndarray, radii: np.ndarray, angles: np.ndarray, colors: np.ndarray, drawLine: bool):
+		num = len(centers)
+		if not num: return
+
+		blits = self.blits
+		for (x, y), radius, step, color in zip(
+				centers.tolist(),
+				np.broadcast_to(radii, num).tolist(),
+				AngleSteps(angles, num).tolist(),
+				map(tuple, np.broadcast_to(colors, (num, 3)).astype(np.int64).tolist())):
+			sprite, (halfX, halfY) = self.Sprite(('circle', color, radius, step, drawLine))
+			blits.append((sprite, (x - halfX, y - halfY)))
+
+	def DrawLayer(self):
+		if not self.dirty or self.full:
+			self.screen.blit(self.layer, (0, 0))
+		else:
+			rects = [rect for _, rect in self.drawnPrev]
+			self.screen.blits([(self.layer, rect, rect) for rect in rects + self.layerRects], doreturn=False)
+			for rect in self.layerRects: self.Track(pygame.Rect(rect))
+
+		self.layerRects.clear()
+
 	def DrawLine(self, x: float, y: float, x2: float, y2: float, color: Tuple[int, int, int], width: int):
-		pygame.draw.line(self.screen, color, (x, y), (x2, y2), width)
+		self.Track(pygame.draw.line(self.target, color, (x, y), (x2, y2), width))
 
 	def DrawQuad(self, x: float, y: float, rx: float, ry: float, alpha: float, color: Tuple[int, int, int]):
 		"""
@@ -41,7 +105,7 @@ class RendererBasic(Renderer):
 		rot(rx, ry) => (rx * cosa - ry * sina, rx * sina + ry * cosa)
 		"""
 		if alpha == 0:
-			pygame.draw.rect(self.screen, color, (x - rx, y - ry, rx * 2, ry * 2))
+			self.Track(pygame.draw.rect(self.target, color, (x - rx, y - ry, rx * 2, ry * 2)))
 		# https://en.wikipedia.org/wiki/Rotation_matrix
 		else:
 			cosa = cos(alpha)
@@ -52,4 +116,115 @@ class RendererBasic(Renderer):
 				(x +  rx * cosa -  ry * sina, y +  rx * sina +  ry * cosa),  # C
 				(x + -rx * cosa -  ry * sina, y + -rx * sina +  ry * cosa),  # D
 			]
-			pygame.draw.polygon(self.screen, color, points)
+			self.Track(pygame.draw.polygon(self.target, color, points))
+
+	def DrawQuads(self, centers: np.ndarray, halves: np.ndarray, angles: np.ndarray, colors: np.ndarray):
+		num = len(centers)
+		if not num: return
+
+		blits = self.blits
+		for (x, y), (rx, ry), step, color in zip(
+				centers.tolist(),
+				np.broadcast_to(halves, (num, 2)).tolist(),
+				AngleSteps(angles, num).tolist(),
+				map(tuple, np.broadcast_to(colors, (num, 3)).astype(np.int64).tolist())):
+			sprite, (halfX, halfY) = self.Sprite(('quad', color, (rx, ry), step))
+			blits.append((sprite, (x - halfX, y - halfY)))
+
+	def DrawSurface(self, surface: pygame.Surface, x: float, y: float):
+		self.Track(self.target.blit(surface, (x, y)))
+
+	def DrawSurfaces(self, blits: List[Tuple[pygame.Surface, Tuple[float, float]]]):
+		if blits: self.Blits(blits)
+
+	def EndLayer(self):
+		self.Flush()
+		self.target = self.screen
+
+	def Flush(self):
+		if self.blits:
+			self.Blits(self.blits)
+			self.blits.clear()
+
+	def Init(self, screen: pygame.Surface):
+		super(RendererBasic, self).Init(screen)
+		self.full   = True
+		self.layer  = pygame.Surface(self.size).convert(screen)
+		self.target = screen
+		self.sprites.clear()
+
+	def Present(self):
+		if not self.dirty or self.full:
+			pygame.display.flip()
+			self.full = False
+		else:
+			keys     = {key for key, _ in self.drawn}
+			keysPrev = {key for key, _ in self.drawnPrev}
+			rects    = [rect for key, rect in self.drawnPrev if key is None or key not in keys]
+			rects   += [rect for key, rect in self.drawn if key is None or key not in keysPrev]
+			if rects: pygame.display.update(rects)
+
+		self.drawnPrev = self.drawn
+		self.drawn     = []
+
+	def SetClip(self, rect: Tuple[int, int, int, int] or None):
+		self.Flush()
+		self.target.set_clip(rect)
+		if rect and self.target is self.layer: self.layerRects.append(rect)
+
+	def SetView(self, scale: float, offset: float):
+		# sprite sizes depend on the scale
+		if scale != self.scale[0]: self.sprites.clear()
+		super(RendererBasic, self).SetView(scale, offset)
+
+	def Track(self, rect: pygame.Rect):
+		"""Remember a rect drawn on the screen, dirty mode only
+		"""
+		if self.dirty and self.target is self.screen: self.drawn.append((None, rect))
+
+	def Sprite(self, key: tuple) -> Tuple[pygame.Surface, Tuple[int, int]]:
+		"""Get a pre-rendered sprite, create it on a miss
+		:return: surface, half sizes (sprite center => top-left)
+		"""
+		if entry := self.sprites.get(key):
+			self.sprites.move_to_end(key)
+			return entry
+
+		if len(self.sprites) >= SPRITE_CACHE: self.sprites.popitem(last=False)
+
+		kind, color, size, step = key[:4]
+		alpha = step * 2 * pi / SPRITE_ANGLES
+
+		if kind == 'circle':
+			halfX   = halfY = ceil(size) + 1
+			surface = pygame.Surface((halfX * 2, halfY * 2))
+			surface.fill(SPRITE_KEY)
+			pygame.draw.circle(surface, color, (halfX, halfY), size)
+			if key[4]:
+				pygame.draw.line(
+					surface, (255 - color[0], 255 - color[1], 255 - color[2]),
+					(halfX, halfY), (halfX + size * cos(alpha), halfY + size * sin(alpha)), 2)
+		else:
+			rx, ry  = size
+			cosa    = cos(alpha)
+			sina    = -sin(alpha)
+			# bounding box of the rotated quad
+			halfX   = ceil(abs(rx * cosa) + abs(ry * sina)) + 1
+			halfY   = ceil(abs(rx * sina) + abs(ry * cosa)) + 1
+			surface = pygame.Surface((halfX * 2, halfY * 2))
+			surface.fill(SPRITE_KEY)
+			pygame.draw.polygon(surface, color, [
+				(halfX + dx * cosa - dy * sina, halfY + dx * sina + dy * cosa)
+				for dx, dy in ((-rx, -ry), (rx, -ry), (rx, ry), (-rx, ry))
+			])
+
+		surface.set_colorkey(SPRITE_KEY, pygame.RLEACCEL)
+		entry = (surface.convert(self.screen), (halfX, halfY))
+		self.sprites[key] = entry
+		return entry
+
+
+def AngleSteps(angles: np.ndarray, num: int) -> np.ndarray:
+	"""Quantize angles to [0, SPRITE_ANGLES)
+	"""
+	return np.rint(np.broadcast_to(angles, num) * (SPRITE_ANGLES / (2 * pi))).astype(np.int64) % SPRITE_ANGLES
@@ -4,24 +4,343 @@
 
 """
 Renderer OpenGL
+- primitives are queued as instances, then each kind is drawn with a single instanced call in Flush
+- lines are drawn as rotated quads, circles are quads with a round mask in the fragment shader
+- the arena layer is a framebuffer object, drawn as a textured quad
+- headless: SDL_VIDEODRIVER=offscreen PYOPENGL_PLATFORM=egl
 """
 
-from typing import Tuple
+from collections import OrderedDict
+import ctypes
+from math import atan2, sqrt
+from typing import List, Tuple
+
+import numpy as np
+from OpenGL import GL
+import pygame
 
 from renderer import Renderer
 
 
+INSTANCE_FLOATS = 9                         # x, y, rx, ry, alpha, r, g, b, flag
+KIND_CIRCLE     = 2
+KIND_LINE       = 0
+KIND_QUAD       = 1
+TEXTURE_CACHE   = 256                       # max surfaces kept as textures
+
+SHADER_FRAGMENT = """
+#version 330 core
+in vec2 local;
+in vec2 radius;
+in vec4 color;
+in float lineAngle;
+out vec4 fragColor;
+uniform int circle;
+
+void main() {
+	if (circle == 0) {
+		fragColor = vec4(color.rgb, 1.0);
+		return;
+	}
+	float dist = length(local);
+	if (dist > 1.0) discard;
+
+	vec2 pixel = local * radius;
+	vec2 dir   = vec2(cos(lineAngle), sin(lineAngle));
+	float t    = dot(pixel, dir);
+	bool line  = color.a > 0.5 && t > 0.0 && t < radius.x && abs(pixel.x * dir.y - pixel.y * dir.x) < 1.0;
+
+	// antialiased edge
+	float edge = clamp((1.0 - dist) * radius.x, 0.0, 1.0);
+	fragColor  = vec4(line ? vec3(1.0) - color.rgb : color.rgb, edge);
+}
+"""
+
+SHADER_VERTEX = """
+#version 330 core
+layout(location = 0) in vec2 corner;
+layout(location = 1) in vec4 rect;
+layout(location = 2) in float alpha;
+layout(location = 3) in vec4 rgbFlag;
+out vec2 local;
+out vec2 radius;
+out vec4 color;
+out float lineAngle;
+uniform int circle;
+uniform vec2 size;
+
+void main() {
+	// same rotation as RendererBasic.DrawQuad: y points down
+	float angle = (circle == 0) ? alpha : 0.0;
+	float cosa  = cos(angle);
+	float sina  = -sin(angle);
+	vec2 offset = corner * rect.zw;
+	vec2 pos    = rect.xy + vec2(offset.x * cosa - offset.y * sina, offset.x * sina + offset.y * cosa);
+
+	gl_Position = vec4(pos.x / size.x * 2.0 - 1.0, 1.0 - pos.y / size.y * 2.0, 0.0, 1.0);
+	local       = corner;
+	radius      = rect.zw;
+	color       = vec4(rgbFlag.rgb / 255.0, rgbFlag.a);
+	lineAngle   = alpha;
+}
+"""
+
+SHADER_TEXTURE_FRAGMENT = """
+#version 330 core
+in vec2 uv;
+out vec4 fragColor;
+uniform sampler2D image;
+
+void main() {
+	fragColor = texture(image, uv);
+}
+"""
+
+SHADER_TEXTURE_VERTEX = """
+#version 330 core
+layout(location = 0) in vec2 corner;
+out vec2 uv;
+uniform vec4 rect;
+uniform vec2 size;
+
+void main() {
+	vec2 pos    = rect.xy + (corner * 0.5 + 0.5) * rect.zw;
+	gl_Position = vec4(pos.x / size.x * 2.0 - 1.0, 1.0 - pos.y / size.y * 2.0, 0.0, 1.0);
+	uv          = corner * 0.5 + 0.5;
+}
+"""
+
+
+def CompileProgram(vertex: str, fragment: str) -> int:
+	"""Compile + link a shader program
+	"""
+	program = GL.glCreateProgram()
+	shaders = []
+	for kind, source in ((GL.GL_VERTEX_SHADER, vertex), (GL.GL_FRAGMENT_SHADER, fragment)):
+		shader = GL.glCreateShader(kind)
+		GL.glShaderSource(shader, source)
+		GL.glCompileShader(shader)
+		if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+			raise RuntimeError(GL.glGetShaderInfoLog(shader).decode())
+		GL.glAttachShader(program, shader)
+		shaders.append(shader)
+
+	GL.glLinkProgram(program)
+	if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+		raise RuntimeError(GL.glGetProgramInfoLog(program).decode())
+
+	for shader in shaders: GL.glDeleteShader(shader)
+	return program
+
+
 class RendererOpenGL(Renderer):
 	def __init__(self, **kwargs):
 		super(RendererOpenGL, self).__init__(**kwargs)
 		print('RendererOpenGL')
-		self.name = 'opengl'
+		self.flags = pygame.OPENGL
+		self.name  = 'opengl'
+
+		self.batches   = ([], [], [])       # per kind: (N, INSTANCE_FLOATS) arrays from Draw*s
+		self.instances = ([], [], [])       # per kind: INSTANCE_FLOATS floats per Draw* call
+		self.surfaces  = []                 # [surface, x, y], drawn last
+		self.textures  = OrderedDict()      # id(surface) => (texture, surface)
+
+		self.layerFbo  = 0
+		self.layerTx   = 0
+		self.program   = 0
+		self.programTx = 0
+		self.vao       = 0
+		self.vaoTx     = 0
+		self.vboCorner = 0
+		self.vboData   = 0
+
+		# must be set before pygame.display.set_mode
+		pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 3)
+		pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 3)
+		pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK, pygame.GL_CONTEXT_PROFILE_CORE)
+
+	def BeginLayer(self):
+		self.Flush()
+		GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.layerFbo)
+
+	def Clear(self, color: Tuple[int, int, int]):
+		GL.glClearColor(color[0] / 255, color[1] / 255, color[2] / 255, 1.0)
+		GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+
+	def Batch(self, kind: int, centers: np.ndarray, halves: np.ndarray, angles: np.ndarray, colors: np.ndarray, flag: float):
+		"""Queue N instances at once
+		"""
+		num = len(centers)
+		if not num: return
+
+		data         = np.empty((num, INSTANCE_FLOATS), dtype=np.float32)
+		data[:, 0:2] = centers
+		data[:, 2:4] = halves
+		data[:, 4]   = angles
+		data[:, 5:8] = colors
+		data[:, 8]   = flag
+		self.batches[kind].append(data)
 
 	def DrawCircle(self, x: float, y: float, radius: float, alpha: float, color: Tuple[int, int, int], drawLine: bool):
-		pass
+		self.instances[KIND_CIRCLE].extend((x, y, radius, radius, alpha, color[0], color[1], color[2], 1.0 if drawLine else 0.0))
+
+	def DrawCircles(self, centers: np.ndarray, radii: np.ndarray, angles: np.ndarray, colors: np.ndarray, drawLine: bool):
+		radii = np.broadcast_to(radii, len(centers))[:, None]
+		self.Batch(KIND_CIRCLE, centers, radii, angles, colors, 1.0 if drawLine else 0.0)
+
+	def DrawLayer(self):
+		# FBO rows go bottom to top => negative height
+		GL.glDisable(GL.GL_BLEND)
+		GL.glUseProgram(self.programTx)
+		GL.glUniform2f(GL.glGetUniformLocation(self.programTx, 'size'), self.size[0], self.size[1])
+		GL.glUniform4f(GL.glGetUniformLocation(self.programTx, 'rect'), 0, self.size[1], self.size[0], -self.size[1])
+		GL.glBindVertexArray(self.vaoTx)
+		GL.glBindTexture(GL.GL_TEXTURE_2D, self.layerTx)
+		GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+		GL.glBindVertexArray(0)
+		GL.glEnable(GL.GL_BLEND)
 
 	def DrawLine(self, x: float, y: float, x2: float, y2: float, color: Tuple[int, int, int], width: int):
-		pass
+		dx = x2 - x
+		dy = y2 - y
+		self.instances[KIND_LINE].extend(((x + x2) / 2, (y + y2) / 2, sqrt(dx * dx + dy * dy) / 2, width / 2, atan2(-dy, dx), color[0], color[1], color[2], 0.0))
+
+	def DrawLines(self, starts: np.ndarray, ends: np.ndarray, colors: np.ndarray, widths: np.ndarray):
+		deltas = ends - starts
+		halves = np.empty((len(starts), 2))
+		halves[:, 0] = np.hypot(deltas[:, 0], deltas[:, 1]) / 2
+		halves[:, 1] = np.asarray(widths) / 2
+		self.Batch(KIND_LINE, (starts + ends) / 2, halves, np.arctan2(-deltas[:, 1], deltas[:, 0]), colors, 0.0)
 
 	def DrawQuad(self, x: float, y: float, rx: float, ry: float, alpha: float, color: Tuple[int, int, int]):
-		pass
+		self.instances[KIND_QUAD].extend((x, y, rx, ry, alpha, color[0], color[1], color[2], 0.0))
+
+	def DrawQuads(self, centers: np.ndarray, halves: np.ndarray, angles: np.ndarray, colors: np.ndarray):
+		self.Batch(KIND_QUAD, centers, halves, angles, colors, 0.0)
+
+	def DrawSurface(self, surface: pygame.Surface, x: float, y: float):
+		self.surfaces.append([surface, x, y])
+
+	def DrawSurfaces(self, blits: List[Tuple[pygame.Surface, Tuple[float, float]]]):
+		self.surfaces.extend([surface, x, y] for surface, (x, y) in blits)
+
+	def EndLayer(self):
+		self.Flush()
+		GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, 0)
+
+	def Flush(self):
+		GL.glUseProgram(self.program)
+		GL.glUniform2f(GL.glGetUniformLocation(self.program, 'size'), self.size[0], self.size[1])
+		GL.glBindVertexArray(self.vao)
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vboData)
+
+		circle = GL.glGetUniformLocation(self.program, 'circle')
+		for kind in (KIND_LINE, KIND_QUAD, KIND_CIRCLE):
+			batches   = self.batches[kind]
+			instances = self.instances[kind]
+			if instances:
+				batches.append(np.array(instances, dtype=np.float32).reshape(-1, INSTANCE_FLOATS))
+				instances.clear()
+			if not batches: continue
+
+			data = batches[0] if len(batches) == 1 else np.concatenate(batches)
+			GL.glBufferData(GL.GL_ARRAY_BUFFER, data.nbytes, data, GL.GL_STREAM_DRAW)
+			GL.glUniform1i(circle, kind == KIND_CIRCLE)
+			GL.glDrawArraysInstanced(GL.GL_TRIANGLE_STRIP, 0, 4, len(data))
+			batches.clear()
+
+		if self.surfaces:
+			GL.glUseProgram(self.programTx)
+			GL.glUniform2f(GL.glGetUniformLocation(self.programTx, 'size'), self.size[0], self.size[1])
+			GL.glBindVertexArray(self.vaoTx)
+			rect = GL.glGetUniformLocation(self.programTx, 'rect')
+			for surface, x, y in self.surfaces:
+				GL.glBindTexture(GL.GL_TEXTURE_2D, self.Texture(surface))
+				GL.glUniform4f(rect, x, y, surface.get_width(), surface.get_height())
+				GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+			self.surfaces.clear()
+
+		GL.glBindVertexArray(0)
+
+	def Init(self, screen: pygame.Surface):
+		super(RendererOpenGL, self).Init(screen)
+		GL.glViewport(0, 0, self.size[0], self.size[1])
+		GL.glEnable(GL.GL_BLEND)
+		GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+
+		self.program   = CompileProgram(SHADER_VERTEX, SHADER_FRAGMENT)
+		self.programTx = CompileProgram(SHADER_TEXTURE_VERTEX, SHADER_TEXTURE_FRAGMENT)
+
+		# unit quad, shared by both programs
+		self.vboCorner = GL.glGenBuffers(1)
+		corners        = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=np.float32)
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vboCorner)
+		GL.glBufferData(GL.GL_ARRAY_BUFFER, corners.nbytes, corners, GL.GL_STATIC_DRAW)
+
+		self.vaoTx = GL.glGenVertexArrays(1)
+		GL.glBindVertexArray(self.vaoTx)
+		GL.glEnableVertexAttribArray(0)
+		GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+
+		# instances: rect (vec4), alpha (float), rgbFlag (vec4)
+		self.vao = GL.glGenVertexArrays(1)
+		GL.glBindVertexArray(self.vao)
+		GL.glEnableVertexAttribArray(0)
+		GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+
+		self.vboData = GL.glGenBuffers(1)
+		GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vboData)
+		stride = INSTANCE_FLOATS * 4
+		for location, count, offset in ((1, 4, 0), (2, 1, 4), (3, 4, 5)):
+			GL.glEnableVertexAttribArray(location)
+			GL.glVertexAttribPointer(location, count, GL.GL_FLOAT, GL.GL_FALSE, stride, ctypes.c_void_p(offset * 4))
+			GL.glVertexAttribDivisor(location, 1)
+
+		GL.glBindVertexArray(0)
+
+		# arena layer
+		self.layerTx = GL.glGenTextures(1)
+		GL.glBindTexture(GL.GL_TEXTURE_2D, self.layerTx)
+		GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+		GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
+		GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA8, self.size[0], self.size[1], 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, None)
+
+		self.layerFbo = GL.glGenFramebuffers(1)
+		GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.layerFbo)
+		GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0, GL.GL_TEXTURE_2D, self.layerTx, 0)
+		GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, 0)
+
+	def SetClip(self, rect: Tuple[int, int, int, int] or None):
+		self.Flush()
+		if rect is None:
+			GL.glDisable(GL.GL_SCISSOR_TEST)
+			return
+
+		# scissor origin is bottom-left
+		x, y, width, height = rect
+		GL.glEnable(GL.GL_SCISSOR_TEST)
+		GL.glScissor(int(x), int(self.size[1] - y - height), int(width), int(height))
+
+	def Texture(self, surface: pygame.Surface) -> int:
+		"""Upload a surface once, the cache holds a reference so the id is not recycled
+		"""
+		key = id(surface)
+		if entry := self.textures.get(key):
+			self.textures.move_to_end(key)
+			return entry[0]
+
+		if len(self.textures) >= TEXTURE_CACHE:
+			texture, _ = self.textures.popitem(last=False)[1]
+			GL.glDeleteTextures([texture])
+
+		width, height = surface.get_size()
+		texture       = GL.glGenTextures(1)
+		GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+		GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+		GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
+		GL.glTexImage2D(
+			GL.GL_TEXTURE_2D, 0, GL.GL_RGBA, width, height, 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE,
+			pygame.image.tostring(surface, 'RGBA'))
+
+		self.textures[key] = (texture, surface)
+		return texture